@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: event clustering with the MinHash/LSH index vs the plain greedy loop.
+
+Generates synthetic headline sets (events reported by several sources
+with reworded titles, plus unrelated one-off stories) and times
+an in-memory ``story_index.StoryIndex`` against the original all-clusters loop,
+reporting how many articles end up in the same cluster under both.
+
+Usage:
+    python bench/cluster_bench.py [sizes...]     # default: 150 500 1000 2000 5000
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from story_index import StoryIndex, jaccard  # noqa: E402
+from tokenizer import title_tokens  # noqa: E402
+
+THRESHOLD = 0.35
+
+_WORDS = [w + str(i) for i in range(400) for w in ("ai", "chip", "glass", "model", "robot")]
+_FILLER = ["the", "new", "launches", "announces", "report", "says", "update", "big", "first", "latest"]
+
+
+def make_titles(n: int, seed: int = 7) -> list[str]:
+    """About a third of the titles are rewordings of shared events."""
+    rng = random.Random(seed)
+    events = [rng.sample(_WORDS, 6) for _ in range(max(n // 6, 1))]
+    titles = []
+    for _ in range(n):
+        if rng.random() < 0.35:
+            words = rng.choice(events)[:]
+            words = rng.sample(words, 5) + rng.sample(_FILLER, 2)
+        else:
+            words = rng.sample(_WORDS, 6) + rng.sample(_FILLER, 1)
+        rng.shuffle(words)
+        titles.append(" ".join(words))
+    return titles
+
+
+def greedy_reference(title_tokens: list[set]) -> list[list[int]]:
+    """The pre-LSH loop: every article against every cluster's token union."""
+    clusters, cluster_tokens = [], []
+    for i, tokens in enumerate(title_tokens):
+        best_cluster, best_sim = -1, 0.0
+        for ci, ct in enumerate(cluster_tokens):
+            sim = jaccard(tokens, ct)
+            if sim > best_sim:
+                best_sim, best_cluster = sim, ci
+        if best_sim >= THRESHOLD:
+            clusters[best_cluster].append(i)
+            cluster_tokens[best_cluster] = cluster_tokens[best_cluster] | tokens
+        else:
+            clusters.append([i])
+            cluster_tokens.append(tokens)
+    return clusters
+
+
+def indexed_clusters(title_tokens: list[set]) -> list[list[int]]:
+    """Incremental assignment as done for each run's new articles."""
+    index = StoryIndex(threshold=THRESHOLD, persist=False)
+    clusters = {}
+    for i, tokens in enumerate(title_tokens):
+        clusters.setdefault(index.assign_tokens(tokens), []).append(i)
+    return list(clusters.values())
+
+
+def _labels(clusters: list[list[int]], n: int) -> list[int]:
+    """Label each index by its cluster's first member (comparable across runs)."""
+    labels = [0] * n
+    for cluster in clusters:
+        for idx in cluster:
+            labels[idx] = cluster[0]
+    return labels
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [150, 500, 1000, 2000, 5000]
+    print(f"{'articles':>8} {'greedy s':>10} {'lsh s':>10} {'speedup':>8} {'clusters':>15} {'same cluster':>13}")
+    for n in sizes:
+        tokens = [title_tokens(t) for t in make_titles(n)]
+
+        start = time.perf_counter()
+        reference = greedy_reference(tokens)
+        greedy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = indexed_clusters(tokens)
+        lsh_time = time.perf_counter() - start
+
+        same = sum(a == b for a, b in zip(_labels(reference, n), _labels(indexed, n))) / n
+        print(f"{n:>8} {greedy_time:>10.3f} {lsh_time:>10.3f} {greedy_time / lsh_time:>7.1f}x "
+              f"{len(reference):>7}/{len(indexed):<7} {same:>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
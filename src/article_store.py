@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Persistent local article store fed by the background poller.
+
+Every ingest appends the entries it has not seen before (keyed by feed
+and the entry's GUID, falling back to its URL) to an SQLite database in
+config/cache.  ``main.py poll`` runs ingest throughout the day, so at
+digest time ``fetch_news.fetch_raw_news`` only needs a windowed query
+here instead of a network pass, and entries that already dropped out of a
+feed's top entries before send time are still available.
+"""
+
+import hashlib
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from cache_files import CACHE_DIR
+from url_canon import canonical_url
+
+STORE_PATH = os.path.join(CACHE_DIR, "articles.db")
+
+# Columns stored per article (besides key / first_seen / canonical_url / seen_at)
+ARTICLE_FIELDS = (
+    "title", "description", "source", "url", "guid", "published",
+    "feed_url", "feed_name", "feed_group", "feed_category", "feed_weight",
+)
+
+# Bump when the schema or url_canon's rules change; _migrate brings older
+# databases up to date (and recomputes canonical_url)
+SCHEMA_VERSION = 5
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS articles (
+    key TEXT PRIMARY KEY,
+    first_seen TEXT NOT NULL,
+    canonical_url TEXT,
+    seen_at TEXT,
+    {", ".join(f"{field} {'NUMERIC' if field == 'feed_weight' else 'TEXT'}" for field in ARTICLE_FIELDS)}
+);
+CREATE TABLE IF NOT EXISTS polls (
+    polled_at TEXT NOT NULL,
+    feeds INTEGER,
+    new_articles INTEGER
+);
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_articles_canonical_url ON articles (canonical_url);
+CREATE INDEX IF NOT EXISTS idx_articles_seen_at ON articles (seen_at);
+CREATE INDEX IF NOT EXISTS idx_articles_feed_seen_at ON articles (feed_url, seen_at);
+CREATE INDEX IF NOT EXISTS idx_articles_feed_group ON articles (feed_group);
+DROP INDEX IF EXISTS idx_articles_published;
+DROP INDEX IF EXISTS idx_articles_source;
+"""
+
+
+def _utcnow() -> str:
+    """Naive UTC ISO timestamp (same convention as article ``published``)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def article_key(article: dict) -> str:
+    """Identity of an entry within its feed: GUID, else URL, else a title hash."""
+    entry_id = article.get("guid") or article.get("url")
+    if not entry_id:
+        entry_id = "sha1:" + hashlib.sha1(article.get("title", "").encode("utf-8")).hexdigest()
+    return f"{article.get('feed_url', '')} {entry_id}"
+
+
+class ArticleStore:
+    """SQLite-backed append-only store of normalized ingest records."""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get("ARTICLE_STORE_PATH", STORE_PATH)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self._conn.executescript(_INDEXES)
+
+    def _migrate(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with self._conn:
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(articles)")}
+            if "canonical_url" not in columns:
+                self._conn.execute("ALTER TABLE articles ADD COLUMN canonical_url TEXT")
+            self._conn.create_function("canonical_url", 1, canonical_url)
+            self._conn.execute("UPDATE articles SET canonical_url = canonical_url(url)")
+            if "seen_at" not in columns:
+                self._conn.execute("ALTER TABLE articles ADD COLUMN seen_at TEXT")
+                self._conn.execute("UPDATE articles SET seen_at = COALESCE(NULLIF(published, ''), first_seen)")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, articles: list[dict]) -> int:
+        """Insert entries not stored yet; returns how many were new."""
+        now = _utcnow()
+        # seen_at (the window column): published time, or first_seen for undated entries
+        rows = [(article_key(a), now, canonical_url(a.get("url", "")), a.get("published") or now,
+                 *(a.get(field, "") for field in ARTICLE_FIELDS))
+                for a in articles]
+        placeholders = ", ".join("?" * (len(ARTICLE_FIELDS) + 4))
+        with self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO articles (key, first_seen, canonical_url, seen_at, {', '.join(ARTICLE_FIELDS)}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+            return self._conn.total_changes - before
+
+    def record_poll(self, feeds: int, new_articles: int):
+        with self._conn:
+            self._conn.execute("INSERT INTO polls VALUES (?, ?, ?)", (_utcnow(), feeds, new_articles))
+
+    def last_poll_age(self):
+        """Seconds since the last recorded poll, or None if never polled."""
+        row = self._conn.execute("SELECT MAX(polled_at) FROM polls").fetchone()
+        if not row or not row[0]:
+            return None
+        return (datetime.fromisoformat(_utcnow()) - datetime.fromisoformat(row[0])).total_seconds()
+
+    @staticmethod
+    def _window(since: datetime, feed_urls: list[str] = None, until: datetime = None) -> tuple[str, list]:
+        """WHERE clause selecting the time window [since, until) (and feeds)."""
+        sql = "seen_at >= ?"
+        params = [since.isoformat()]
+        if until is not None:
+            sql += " AND seen_at < ?"
+            params.append(until.isoformat())
+        if feed_urls is not None:
+            sql += f" AND feed_url IN ({', '.join('?' * len(feed_urls))})"
+            params.extend(feed_urls)
+        return sql, params
+
+    def count_by(self, column: str, since: datetime, feed_urls: list[str] = None, until: datetime = None) -> dict:
+        """Number of windowed entries per ``column`` value (e.g. feed_url, source)."""
+        if column not in ARTICLE_FIELDS:
+            raise ValueError(f"unknown column: {column}")
+        where, params = self._window(since, feed_urls, until)
+        sql = f"SELECT {column}, COUNT(*) FROM articles WHERE {where} GROUP BY {column}"
+        return dict(self._conn.execute(sql, params).fetchall())
+
+    def select(self, since: datetime, feed_urls: list[str] = None, group_limits: dict = None,
+               default_limit: int = 3, unlimited_urls: set = None, until: datetime = None) -> tuple[list[dict], int]:
+        """Windowed entries, capped per source and deduplicated by canonical URL, newest first.
+
+        Each source keeps its newest ``group_limits[group]`` entries (group of
+        its newest entry, ``default_limit`` if unlisted); sources with any
+        entry from ``unlimited_urls`` are not capped.  Of entries sharing a
+        canonical URL only the newest is kept.
+
+        Returns (articles, duplicates removed).  Articles carry an
+        ``unlimited`` flag for sources exempt from the cap.
+        """
+        where, params = self._window(since, feed_urls, until)
+        limits = [(group, int(n)) for group, n in (group_limits or {}).items()] or [("", default_limit)]
+        unlimited = list(unlimited_urls or ())
+        unlimited_expr = f"feed_url IN ({', '.join('?' * len(unlimited))})" if unlimited else "0"
+        fields = ", ".join(ARTICLE_FIELDS)
+        sql = f"""
+        WITH windowed AS (
+            SELECT key, canonical_url, {fields},
+                   ROW_NUMBER() OVER (PARTITION BY source ORDER BY published DESC) AS source_rank,
+                   FIRST_VALUE(feed_group) OVER (PARTITION BY source ORDER BY published DESC) AS source_group,
+                   MAX({unlimited_expr}) OVER (PARTITION BY source) AS unlimited
+            FROM articles WHERE {where}
+        ),
+        limits (grp, n) AS (VALUES {", ".join("(?, ?)" for _ in limits)}),
+        limited AS (
+            SELECT windowed.*,
+                   ROW_NUMBER() OVER (PARTITION BY COALESCE(NULLIF(canonical_url, ''), key)
+                                      ORDER BY published DESC) AS url_rank,
+                   COUNT(*) OVER () AS limited_total
+            FROM windowed LEFT JOIN limits ON limits.grp = windowed.source_group
+            WHERE unlimited OR source_rank <= COALESCE(limits.n, ?)
+        )
+        SELECT {fields}, unlimited, limited_total FROM limited WHERE url_rank = 1 ORDER BY published DESC
+        """
+        args = unlimited + params + [v for limit in limits for v in limit] + [default_limit]
+        rows = [dict(row) for row in self._conn.execute(sql, args)]
+        total = rows[0]["limited_total"] if rows else 0
+        for row in rows:
+            del row["limited_total"]
+            row["unlimited"] = bool(row["unlimited"])
+        return rows, total - len(rows)
+
+    def prune(self, days: int):
+        """Drop entries first seen more than ``days`` ago, and old poll records."""
+        before = (datetime.fromisoformat(_utcnow()) - timedelta(days=days)).isoformat()
+        with self._conn:
+            self._conn.execute("DELETE FROM articles WHERE first_seen < ?", (before,))
+            self._conn.execute("DELETE FROM polls WHERE polled_at < ?", (before,))
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+State files under config/cache (gitignored, restored by actions/cache).
+
+The feed cache, feed health, ingest snapshot, sent / story indexes and
+the LLM cache all keep their state here.  ``save_json`` writes a temp
+file and renames it over the old one, so a run killed mid-write never
+leaves a truncated file behind.
+"""
+
+import json
+import os
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "cache")
+
+
+def save_json(path: str, data, label: str) -> bool:
+    """Atomically write data as JSON; prints a warning naming ``label`` on failure."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"  Warning: Failed to save {label}: {e}")
+        return False
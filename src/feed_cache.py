@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Persistent conditional-GET cache for RSS feeds.
+
+For every feed URL we remember the validators of the last response
+(ETag / Last-Modified), a hash of the raw body and the entries parsed from
+it.  On the next run the validators are sent back as If-None-Match /
+If-Modified-Since; a 304 or an identical body hash lets the fetch engine
+(see feed_engine) reuse the cached entries instead of re-downloading and
+re-parsing.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from cache_files import CACHE_DIR, save_json
+
+CACHE_PATH = os.path.join(CACHE_DIR, "feed_cache.json")
+
+# Bump when the stored entry format changes; older caches are discarded
+CACHE_VERSION = 4
+
+# Entries for feeds that haven't been requested for this long are dropped on save
+STALE_DAYS = 7
+
+
+def body_hash(content: bytes) -> str:
+    """Stable hash of a feed response body."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class FeedCache:
+    """On-disk cache of feed validators and parsed entries, keyed by feed URL.
+
+    Thread-safe: one instance is shared by all feeds of an ingest pass (the
+    threaded fallback fetches from many threads).  Hit/miss counters are
+    kept per instance so ``ingest`` can report them.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get("FEED_CACHE_PATH", CACHE_PATH)
+        self._lock = threading.Lock()
+        self._feeds = self._load()
+        self.not_modified = 0   # server answered 304
+        self.unchanged = 0      # 200, but body hash matched the cached one
+        self.misses = 0         # body changed or feed not cached
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                return {}
+            return data.get("feeds", {})
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            return {}
+
+    @property
+    def hits(self) -> int:
+        return self.not_modified + self.unchanged
+
+    def get(self, url: str):
+        """Return the cached record for a feed URL, or None."""
+        with self._lock:
+            return self._feeds.get(url)
+
+    def conditional_headers(self, url: str) -> dict:
+        """Build If-None-Match / If-Modified-Since headers for a cached feed."""
+        record = self.get(url)
+        if not record or "entries" not in record:
+            return {}
+        headers = {}
+        if record.get("etag"):
+            headers["If-None-Match"] = record["etag"]
+        if record.get("last_modified"):
+            headers["If-Modified-Since"] = record["last_modified"]
+        return headers
+
+    def touch(self, url: str, not_modified: bool):
+        """Record a cache hit (304 or same body hash) for a feed."""
+        with self._lock:
+            record = self._feeds.get(url)
+            if record is not None:
+                record["checked_at"] = datetime.now().isoformat()
+            if not_modified:
+                self.not_modified += 1
+            else:
+                self.unchanged += 1
+
+    def put(self, url: str, etag: str, last_modified: str, digest: str, source: str, entries: list[dict]):
+        """Store a freshly parsed feed."""
+        with self._lock:
+            self._feeds[url] = {
+                "etag": etag or "",
+                "last_modified": last_modified or "",
+                "body_hash": digest,
+                "source": source,
+                "entries": entries,
+                "checked_at": datetime.now().isoformat(),
+            }
+            self.misses += 1
+
+    def save(self):
+        """Write the cache to disk, dropping feeds not requested recently."""
+        stale_before = (datetime.now() - timedelta(days=STALE_DAYS)).isoformat()
+        with self._lock:
+            feeds = {u: r for u, r in self._feeds.items() if r.get("checked_at", "") >= stale_before}
+        save_json(self.path, {"version": CACHE_VERSION, "feeds": feeds}, "feed cache")
+
+    def summary(self) -> str:
+        return f"缓存命中: {self.hits} (304: {self.not_modified}, 未变: {self.unchanged}), 未命中: {self.misses}"
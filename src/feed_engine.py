@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Feed fetch engine.
+
+Downloads many RSS feeds concurrently on a single asyncio event loop
+(aiohttp) with per-request connect/read timeouts.  ``feedparser`` is
+CPU-bound, so parsing runs in a process pool and never blocks network I/O.
+Falls back to a thread pool of blocking requests when aiohttp is missing.
+Both paths keep per-host keep-alive pools (see http_pool).
+"""
+
+import asyncio
+import html
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+import feedparser
+import requests
+
+from feed_cache import FeedCache, body_hash
+from http_pool import USER_AGENT, get_pool_size, get_session
+
+# Defaults for the optional settings.json "fetch" block
+DEFAULT_FETCH_OPTIONS = {
+    "concurrency": 200,      # max simultaneous connections on the event loop
+    "feeds_in_flight": 32,   # feeds downloading at once; the rest wait in priority order
+    "connect_timeout": 5,    # seconds to establish a connection
+    "read_timeout": 10,      # seconds between received chunks
+    "parse_workers": 4,      # processes running feedparser
+    "pool_size": 10,         # keep-alive connections per host
+    "feed_deadline": 30,     # hard cap on one feed's download + parse (seconds)
+    "run_deadline": 240,     # hard cap on the whole fetch (seconds)
+    "min_run_deadline": 30,  # fetch budget floor when the send time is close
+    "llm_lead_minutes": 20,  # scheduled runs: fetch stops this long before send time
+    "snapshot_max_age": 1800,  # seconds an ingest snapshot is reused (see ingest)
+    "poll_max_age": 5400,    # store polled this recently (seconds): the digest only tops it up ...
+    "topup_deadline": 45,    # ... within this many seconds (see fetch_news.refresh_articles)
+    "store_retention_days": 7,  # article store keeps entries first seen within this many days
+    "max_bytes": 5 * 1024 * 1024,  # abort feeds larger than this
+    "max_entry_age_days": 3,  # entries older than this are dropped at parse time
+    # Adaptive deadlines and circuit breaker (see feed_health)
+    "timeout_multiplier": 3,  # per-feed deadline = p95 latency x this ...
+    "min_feed_timeout": 5,    # ... but never below this (seconds)
+    "breaker_failures": 5,    # consecutive failed runs before a feed is skipped
+    "breaker_probe_hours": 12,  # skipped feeds are probed once per this interval
+}
+
+# Entries kept per feed, for the digest's article store and the aggregator alike
+MAX_ENTRIES = 50
+# Description length kept after HTML stripping
+MAX_DESCRIPTION = 800
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+_ROOT_RE = re.compile(rb"<(rss|feed|rdf:RDF)[\s>]")
+_CDATA_OPEN = b"<![CDATA["
+_CDATA_CLOSE = b"]]>"
+
+# Per root element: the tag closing one entry, and the tags appended when a
+# body is cut after MAX_ENTRIES entries so feedparser still sees valid XML
+_ROOT_TAGS = {
+    b"rss": (b"</item>", b"</channel></rss>"),
+    b"feed": (b"</entry>", b"</feed>"),
+    b"rdf:RDF": (b"</item>", b"</rdf:RDF>"),
+}
+
+
+class NotAFeedError(ValueError):
+    """Response body is an HTML page (rsshub error page, login wall...), not a feed."""
+
+
+class FeedTooLargeError(ValueError):
+    """Response body exceeded the configured max_bytes."""
+
+
+def get_fetch_options(settings: dict = None) -> dict:
+    """Merge settings.json ``fetch`` overrides onto the defaults."""
+    options = dict(DEFAULT_FETCH_OPTIONS)
+    options.update((settings or {}).get("fetch", {}))
+    return options
+
+
+def strip_html(text: str) -> str:
+    """Drop tags, unescape entities and collapse whitespace."""
+    text = _TAG_RE.sub(" ", text or "")
+    return _SPACE_RE.sub(" ", html.unescape(text)).strip()
+
+
+def entry_published(entry):
+    """Published (or updated) time of a feed entry as naive UTC datetime, or None."""
+    for key in ("published_parsed", "updated_parsed"):
+        t = entry.get(key)
+        if t:
+            try:
+                return datetime(*t[:6])
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+def parse_feed_body(content: bytes, feed_url: str, cutoff: datetime = None) -> tuple[str, list[dict]]:
+    """Parse a feed body into normalized entries (first MAX_ENTRIES).
+
+    Entries published before cutoff are skipped before any HTML stripping.
+    Returns (source_name, entries).  Runs inside the parse worker pool, so it
+    must stay a plain top-level function returning picklable data.
+    """
+    feed = feedparser.parse(content)
+    if feed.bozo and not feed.entries:
+        raise ValueError(str(feed.bozo_exception))
+    source_name = feed.feed.get("title", feed_url)
+
+    entries = []
+    for entry in feed.entries[:MAX_ENTRIES]:
+        published = entry_published(entry)
+        if cutoff and published and published < cutoff:
+            continue
+        entries.append({
+            "title": entry.get("title", "").strip(),
+            "description": strip_html(entry.get("summary", entry.get("description", "")))[:MAX_DESCRIPTION],
+            # Feedburner wraps links in a tracking redirect; origLink is the article
+            "url": (entry.get("feedburner_origlink") or entry.get("link", "")).strip(),
+            "guid": entry.get("id", "").strip(),
+            "published": published.isoformat() if published else ""
+        })
+    return source_name, entries
+
+
+def entries_to_articles(feed_url: str, source_name: str, entries: list[dict], cutoff: datetime = None) -> list[dict]:
+    """Turn cached/parsed entries into article dicts, dropping those older than cutoff."""
+    articles = []
+    for entry in entries:
+        # Skip if too old or no date
+        published = entry["published"]
+        if cutoff and published and datetime.fromisoformat(published) < cutoff:
+            continue
+
+        articles.append({
+            "title": entry["title"],
+            "description": entry["description"],
+            "source": source_name,
+            "feed_url": feed_url,
+            "url": entry["url"],
+            "guid": entry["guid"],
+            "published": published
+        })
+    return articles
+
+
+def _request_headers(feed_url: str, cache: FeedCache = None) -> dict:
+    headers = {"User-Agent": USER_AGENT}
+    if cache:
+        headers.update(cache.conditional_headers(feed_url))
+    return headers
+
+
+def _from_cache(cache: FeedCache, feed_url: str, status: int, digest: str):
+    """Return cached (source_name, entries) for a 304 or an unchanged body, else None."""
+    cached = cache.get(feed_url) if cache else None
+    if not cached:
+        return None
+    if status == 304:
+        cache.touch(feed_url, not_modified=True)
+        return cached["source"], cached["entries"]
+    if cached.get("body_hash") == digest:
+        cache.touch(feed_url, not_modified=False)
+        return cached["source"], cached["entries"]
+    return None
+
+
+class FeedDeadlineExceeded(requests.Timeout):
+    """A feed download ran past its hard deadline."""
+
+
+class _FeedBody:
+    """Accumulates a streamed feed body.
+
+    Sniffs the first bytes and rejects HTML pages, enforces max_bytes, and
+    reports ``done`` once max_entries entries have fully arrived, at which
+    point the body is cut after the last of them and re-closed.  Closing
+    tags inside CDATA sections (escaped HTML in descriptions) don't count.
+    """
+
+    SNIFF_BYTES = 512
+
+    def __init__(self, feed_url: str, max_bytes: int, max_entries: int = MAX_ENTRIES):
+        self.feed_url = feed_url
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._buf = bytearray()
+        self._sniffed = False
+        self._root = None
+        self._scan_pos = 0
+        self._entry_count = 0
+        self._in_cdata = False
+        self._cut_at = None
+
+    def check_length(self, content_length):
+        if content_length and self.max_bytes and int(content_length) > self.max_bytes:
+            raise FeedTooLargeError(f"feed is {int(content_length)} bytes (max {self.max_bytes})")
+
+    def add(self, chunk: bytes) -> bool:
+        """Append a chunk; returns True when no more data is needed."""
+        self._buf += chunk
+        if not self._sniffed and (len(self._buf) >= self.SNIFF_BYTES or not chunk):
+            self._sniff()
+        if self.max_bytes and len(self._buf) > self.max_bytes:
+            raise FeedTooLargeError(f"feed exceeded {self.max_bytes} bytes")
+        return self._count_entries()
+
+    def _sniff(self):
+        self._sniffed = True
+        head = bytes(self._buf[:self.SNIFF_BYTES]).lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+        if head.startswith((b"<!doctype html", b"<html")):
+            raise NotAFeedError("response is an HTML page, not a feed")
+
+    def _count_entries(self) -> bool:
+        if self._root is None:
+            m = _ROOT_RE.search(self._buf)
+            if m is None:
+                return False
+            self._root = m.group(1)
+        closer = _ROOT_TAGS[self._root][0]
+        buf = self._buf
+        pos = self._scan_pos
+        while True:
+            if self._in_cdata:
+                i = buf.find(_CDATA_CLOSE, pos)
+                if i == -1:
+                    token = _CDATA_CLOSE
+                    break
+                pos = i + len(_CDATA_CLOSE)
+                self._in_cdata = False
+                continue
+            i = buf.find(closer, pos)
+            cdata = buf.find(_CDATA_OPEN, pos, len(buf) if i == -1 else i)
+            if cdata != -1:
+                pos = cdata + len(_CDATA_OPEN)
+                self._in_cdata = True
+                continue
+            if i == -1:
+                token = _CDATA_OPEN  # the longer of the two tags searched for
+                break
+            pos = i + len(closer)
+            self._entry_count += 1
+            if self._entry_count >= self.max_entries:
+                self._cut_at = pos
+                return True
+        # Next scan starts early enough to catch a tag split across chunks
+        self._scan_pos = max(pos, len(buf) - len(token) + 1)
+        return False
+
+    def content(self) -> bytes:
+        if not self._sniffed:
+            self._sniff()
+        if self._cut_at is None:
+            return bytes(self._buf)
+        return bytes(self._buf[:self._cut_at]) + _ROOT_TAGS[self._root][1]
+
+
+def download_feed(feed_url: str, headers: dict = None, timeout=10, deadline: float = None,
+                  max_bytes: int = DEFAULT_FETCH_OPTIONS["max_bytes"]) -> tuple[int, dict, bytes]:
+    """Stream a feed body through the pooled session.
+
+    ``timeout`` bounds connect/read of each socket operation, ``deadline``
+    bounds the whole download (a server trickling bytes can't hold us past it).
+    HTML pages and bodies over max_bytes are aborted after the first chunk
+    that reveals them; the download stops early once MAX_ENTRIES entries arrived.
+    Returns (status_code, headers, content); raises on network/HTTP errors.
+    """
+    start = time.time()
+    with get_session().get(feed_url, headers=headers, timeout=timeout, stream=True) as resp:
+        if resp.status_code != 304:
+            resp.raise_for_status()
+        body = _FeedBody(feed_url, max_bytes)
+        body.check_length(resp.headers.get("Content-Length"))
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            if body.add(chunk):
+                break
+            if deadline and time.time() - start > deadline:
+                raise FeedDeadlineExceeded(f"download exceeded {deadline}s deadline")
+        return resp.status_code, resp.headers, body.content() if resp.status_code != 304 else b""
+
+
+def _entry_floor(max_entry_age_days: float) -> datetime:
+    """Oldest publish time kept at parse time (naive UTC, like entry timestamps).
+
+    Applied when parsing rather than per caller, so cached entries don't
+    depend on which view's cutoff happened to populate the cache.
+    """
+    return datetime.utcnow() - timedelta(days=max_entry_age_days)
+
+
+def fetch_feed(feed_url: str, cutoff: datetime = None, cache: FeedCache = None, timeout: float = 10,
+               deadline: float = None, max_bytes: int = DEFAULT_FETCH_OPTIONS["max_bytes"],
+               max_entry_age_days: float = DEFAULT_FETCH_OPTIONS["max_entry_age_days"]) -> tuple[int, list[dict]]:
+    """Blocking fetch + parse of a single feed (the threaded fallback).
+
+    Returns (HTTP status, articles).  Raises on network/HTTP errors.
+    """
+    status, headers, content = download_feed(feed_url, _request_headers(feed_url, cache), timeout, deadline, max_bytes)
+    digest = body_hash(content)
+    hit = _from_cache(cache, feed_url, status, digest)
+    if hit:
+        source_name, entries = hit
+    else:
+        source_name, entries = parse_feed_body(content, feed_url, _entry_floor(max_entry_age_days))
+        if cache:
+            cache.put(feed_url, headers.get("ETag"), headers.get("Last-Modified"),
+                      digest, source_name, entries)
+    return status, entries_to_articles(feed_url, source_name, entries, cutoff)
+
+
+def _describe_error(e: Exception) -> str:
+    """Classify a fetch exception: 'timeout' or the error message."""
+    if isinstance(e, (asyncio.TimeoutError, requests.Timeout)):
+        return "timeout"
+    err_str = str(e)
+    if 'timeout' in err_str.lower() or 'timed out' in err_str.lower():
+        return "timeout"
+    return err_str or type(e).__name__
+
+
+async def _fetch_feed_async(session, parse_pool, feed_url: str, cutoff: datetime, cache: FeedCache,
+                            options: dict) -> tuple[int, list[dict]]:
+    async with session.get(feed_url, headers=_request_headers(feed_url, cache)) as resp:
+        status = resp.status
+        if status != 304:
+            resp.raise_for_status()
+        body = _FeedBody(feed_url, options["max_bytes"])
+        body.check_length(resp.headers.get("Content-Length"))
+        async for chunk in resp.content.iter_chunked(64 * 1024):
+            if body.add(chunk):
+                break
+        content = body.content() if status != 304 else b""
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+
+    digest = body_hash(content)
+    hit = _from_cache(cache, feed_url, status, digest)
+    if hit:
+        source_name, entries = hit
+    else:
+        loop = asyncio.get_running_loop()
+        source_name, entries = await loop.run_in_executor(
+            parse_pool, parse_feed_body, content, feed_url, _entry_floor(options["max_entry_age_days"]),
+        )
+        if cache:
+            cache.put(feed_url, etag, last_modified, digest, source_name, entries)
+    return status, entries_to_articles(feed_url, source_name, entries, cutoff)
+
+
+def _cutoff_result(url: str, elapsed: float) -> dict:
+    return {"url": url, "articles": [], "error": "cutoff", "elapsed": elapsed, "not_modified": False}
+
+
+def _result(url: str, start: float, status: int = None, articles: list[dict] = (), error: str = None) -> dict:
+    return {"url": url, "articles": list(articles), "error": error, "elapsed": time.time() - start,
+            "not_modified": status == 304}
+
+
+async def _fetch_all_async(feed_urls: list[str], cutoff: datetime, cache: FeedCache, options: dict, deadlines: dict) -> list[dict]:
+    timeout = aiohttp.ClientTimeout(
+        total=None, sock_connect=options["connect_timeout"], sock_read=options["read_timeout"],
+    )
+    connector = aiohttp.TCPConnector(
+        limit=options["concurrency"], limit_per_host=get_pool_size(options), keepalive_timeout=30,
+    )
+
+    # Started in input (priority) order: the semaphore wakes waiters first come, first served
+    slots = asyncio.Semaphore(options["feeds_in_flight"])
+
+    with ProcessPoolExecutor(max_workers=options["parse_workers"]) as parse_pool:
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+
+            async def run(url):
+                async with slots:
+                    start = time.time()
+                    try:
+                        status, articles = await asyncio.wait_for(
+                            _fetch_feed_async(session, parse_pool, url, cutoff, cache, options),
+                            deadlines.get(url, options["feed_deadline"]),
+                        )
+                        return _result(url, start, status, articles)
+                    except Exception as e:
+                        return _result(url, start, error=_describe_error(e))
+
+            run_start = time.time()
+            tasks = [asyncio.create_task(run(url)) for url in feed_urls]
+            if not tasks:
+                return []
+            done, pending = await asyncio.wait(tasks, timeout=options["run_deadline"])
+            for task in pending:
+                task.cancel()
+            run_elapsed = time.time() - run_start
+            return [task.result() if task in done else _cutoff_result(url, run_elapsed)
+                    for url, task in zip(feed_urls, tasks)]
+
+
+def _fetch_all_threaded(feed_urls: list[str], cutoff: datetime, cache: FeedCache, options: dict, deadlines: dict) -> list[dict]:
+    get_session(get_pool_size(options))
+
+    def run(url):
+        start = time.time()
+        try:
+            status, articles = fetch_feed(url, cutoff, cache, (options["connect_timeout"], options["read_timeout"]),
+                                          deadlines.get(url, options["feed_deadline"]), options["max_bytes"],
+                                          options["max_entry_age_days"])
+            return _result(url, start, status, articles)
+        except Exception as e:
+            return _result(url, start, error=_describe_error(e))
+
+    run_start = time.time()
+    executor = ThreadPoolExecutor(max_workers=options["feeds_in_flight"])
+    futures = [executor.submit(run, url) for url in feed_urls]
+    done, _ = wait(futures, timeout=options["run_deadline"])
+    # Don't wait for stragglers; each is bounded by its own feed deadline anyway
+    executor.shutdown(wait=False, cancel_futures=True)
+    run_elapsed = time.time() - run_start
+    return [future.result() if future in done else _cutoff_result(url, run_elapsed)
+            for url, future in zip(feed_urls, futures)]
+
+
+def fetch_feeds(feed_urls: list[str], cutoff: datetime = None, cache: FeedCache = None, settings: dict = None,
+                deadlines: dict = None, run_deadline: float = None) -> list[dict]:
+    """Fetch and parse many feeds concurrently.
+
+    At most fetch.feeds_in_flight feeds download at once and the others
+    start in input order as slots free up, so callers list the important
+    ones first: when the run deadline hits, whatever has arrived is returned.
+    ``deadlines`` optionally overrides fetch.feed_deadline per URL and
+    ``run_deadline`` shortens fetch.run_deadline (e.g. to meet a send time).
+
+    Returns one result per feed URL, in input order:
+    ``{"url", "articles", "error", "elapsed", "not_modified"}`` where
+    ``not_modified`` marks a 304 answer and ``error`` is None on success,
+    ``"timeout"`` when the feed hit its own deadline, ``"cutoff"`` when the
+    run deadline stopped it, or the error message otherwise.
+    With ``cutoff=None`` every parsed entry is kept.
+    """
+    options = get_fetch_options(settings)
+    if run_deadline is not None:
+        options["run_deadline"] = min(options["run_deadline"], max(run_deadline, options["min_run_deadline"]))
+    if aiohttp is None:
+        print("  - aiohttp not installed, using thread pool fetcher")
+        return _fetch_all_threaded(feed_urls, cutoff, cache, options, deadlines or {})
+    return asyncio.run(_fetch_all_async(feed_urls, cutoff, cache, options, deadlines or {}))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Per-feed health history: latency percentiles, failure streaks, last success.
+
+Drives two decisions in ``ingest``:
+- adaptive timeouts: each feed's hard deadline is derived from its own p95
+  latency instead of one global value;
+- circuit breaker: feeds that failed many runs in a row are skipped, and
+  only probed again once per ``breaker_probe_hours``;
+- fetch priority: feeds that usually yield more entries start earlier.
+"""
+
+import json
+import math
+import os
+from datetime import datetime, timedelta
+
+from cache_files import CACHE_DIR, save_json
+
+HEALTH_PATH = os.path.join(CACHE_DIR, "feed_health.json")
+
+# Latency samples kept per feed for the percentile
+LATENCY_SAMPLES = 30
+# Percentiles need a few samples before they replace the default deadline
+MIN_SAMPLES = 5
+# Smoothing of the per-feed entry yield (weight of the newest run)
+YIELD_ALPHA = 0.3
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class FeedHealth:
+    """On-disk health records keyed by feed URL."""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get("FEED_HEALTH_PATH", HEALTH_PATH)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._feeds = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._feeds = {}
+
+    def get(self, url: str) -> dict:
+        return self._feeds.get(url, {})
+
+    def deadline(self, url: str, options: dict) -> float:
+        """Hard deadline for one feed: p95 latency x multiplier, clamped to [min, feed_deadline].
+
+        Breaker probes get the full feed_deadline, so a feed that slowed
+        down for good can still get through and close its circuit.
+        """
+        record = self.get(url)
+        latencies = record.get("latencies", [])
+        if len(latencies) < MIN_SAMPLES or record.get("consecutive_failures", 0) >= options["breaker_failures"]:
+            return options["feed_deadline"]
+        p95 = percentile(latencies, 95)
+        return min(max(p95 * options["timeout_multiplier"], options["min_feed_timeout"]), options["feed_deadline"])
+
+    def should_fetch(self, url: str, options: dict) -> tuple[bool, str]:
+        """Circuit breaker. Returns (fetch?, reason); open circuits allow one probe per interval."""
+        record = self.get(url)
+        failures = record.get("consecutive_failures", 0)
+        if failures < options["breaker_failures"]:
+            return True, ""
+        last_attempt = record.get("last_attempt", "")
+        probe_after = (datetime.now() - timedelta(hours=options["breaker_probe_hours"])).isoformat()
+        if last_attempt <= probe_after:
+            return True, "probe"
+        return False, f"circuit open ({failures} consecutive failures, last success {record.get('last_success') or 'never'})"
+
+    def entry_yield(self, url: str) -> float:
+        """Smoothed number of entries per successful fetch (0 for unknown feeds)."""
+        return self.get(url).get("yield", 0.0)
+
+    def record(self, url: str, ok: bool, elapsed: float, error: str = "", entries: int = 0,
+               not_modified: bool = False):
+        """Record one fetch attempt.
+
+        A timeout adds its elapsed time as a (censored) latency sample: the
+        feed took at least that long, so repeated timeouts widen the
+        deadline instead of failing at the same value every run.  304
+        responses add none, as they say nothing about full downloads.
+        """
+        record = self._feeds.setdefault(url, {})
+        now = datetime.now().isoformat()
+        record["last_attempt"] = now
+        if (ok or error == "timeout") and not not_modified:
+            record["latencies"] = (record.get("latencies", []) + [round(elapsed, 2)])[-LATENCY_SAMPLES:]
+        if ok:
+            previous = record.get("yield")
+            record["yield"] = round(entries if previous is None else previous + YIELD_ALPHA * (entries - previous), 2)
+            record["consecutive_failures"] = 0
+            record["last_success"] = now
+        else:
+            record["consecutive_failures"] = record.get("consecutive_failures", 0) + 1
+            record["last_error"] = error
+
+    def summary(self, url: str) -> dict:
+        """Latency percentiles and failure streak, for logs / feed_stats."""
+        record = self.get(url)
+        latencies = record.get("latencies", [])
+        return {
+            "p50": percentile(latencies, 50) if latencies else None,
+            "p95": percentile(latencies, 95) if latencies else None,
+            "consecutive_failures": record.get("consecutive_failures", 0),
+            "last_success": record.get("last_success", ""),
+        }
+
+    def save(self, keep_urls: list[str] = None):
+        """Write records to disk; with keep_urls, drop feeds no longer configured."""
+        feeds = self._feeds
+        if keep_urls is not None:
+            keep = set(keep_urls)
+            feeds = {u: r for u, r in feeds.items() if u in keep}
+        save_json(self.path, feeds, "feed health")
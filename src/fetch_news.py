@@ -7,13 +7,35 @@ try:
     import anthropic
 except ImportError:
     anthropic = None
-import feedparser
 import json
 import os
-import requests
+import threading
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from article_store import ArticleStore
+from feed_engine import get_fetch_options
+from filter_rules import RulePlan
+from ingest import PRIORITY_GROUP, ingest
+from json_stream import JSONStreamParser
+from llm_cache import get_llm_cache, is_bypassed as llm_cache_bypassed
+from prompt_packer import get_token_budget, pack_articles
+from ranker import rank_candidates
+from sent_index import SentIndex, get_lookback_days
+from story_index import StoryIndex
+from url_canon import DedupIndex
+
+# LLM backends (responses are cached per backend + model, see llm_cache)
+DEEPSEEK_MODEL = "deepseek-chat"
+HAIKU_MODEL = "claude-haiku-4-5-20251001"
+
+# In-flight LLM requests per process (provider rate limits), env LLM_MAX_CONCURRENCY overrides
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "3"))
+_llm_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+# Ranked candidates (events) offered to the prompt packer; settings "prompt_max_articles"
+# overrides.  The per-mode token budget usually binds first (see prompt_packer)
+PROMPT_MAX_ARTICLES = 150
 
 # Fallback RSS feeds (used when settings.json has no rss_feeds)
 DEFAULT_RSS_FEEDS = [
@@ -154,6 +176,19 @@ def get_categories(settings: dict = None) -> list[dict]:
     order = settings.get("categories_order", list(CATEGORY_ICONS.keys()))
     return [{"name": name, "icon": CATEGORY_ICONS.get(name, "📰")} for name in order if name in CATEGORY_ICONS]
 
+def get_send_time(settings: dict, channel: dict = None) -> tuple[int, int]:
+    """Scheduled (send_hour, send_minute) of a channel.
+
+    Without a channel: the first channel's time, else top-level settings, else 10:00.
+    """
+    if channel:
+        return channel.get("send_hour", 10), channel.get("send_minute", 0)
+    channels = settings.get("channels", [])
+    first = channels[0] if channels else {}
+    send_hour = first.get("send_hour", settings.get("send_hour", 10))
+    send_minute = first.get("send_minute", settings.get("send_minute", 0))
+    return send_hour, send_minute
+
 def get_time_window(settings: dict = None, manual: bool = False, channel: dict = None) -> tuple[str, str]:
     """Calculate the news time window.
 
@@ -169,15 +204,7 @@ def get_time_window(settings: dict = None, manual: bool = False, channel: dict =
     if settings is None:
         settings = load_settings()
 
-    if channel:
-        send_hour = channel.get("send_hour", 10)
-        send_minute = channel.get("send_minute", 0)
-    else:
-        # Fallback: use the first channel's time, or defaults
-        channels = settings.get("channels", [])
-        first = channels[0] if channels else {}
-        send_hour = first.get("send_hour", settings.get("send_hour", 10))
-        send_minute = first.get("send_minute", settings.get("send_minute", 0))
+    send_hour, send_minute = get_send_time(settings, channel)
 
     tz_name = settings.get("timezone", "Asia/Shanghai")
     tz = ZoneInfo(tz_name)
@@ -213,14 +240,7 @@ def get_cutoff_time(settings: dict = None, manual: bool = False, channel: dict =
     tz_name = settings.get("timezone", "Asia/Shanghai")
     tz = ZoneInfo(tz_name)
 
-    if channel:
-        send_hour = channel.get("send_hour", 10)
-        send_minute = channel.get("send_minute", 0)
-    else:
-        channels = settings.get("channels", [])
-        first = channels[0] if channels else {}
-        send_hour = first.get("send_hour", settings.get("send_hour", 10))
-        send_minute = first.get("send_minute", settings.get("send_minute", 0))
+    send_hour, send_minute = get_send_time(settings, channel)
 
     now = datetime.now(tz)
 
@@ -235,72 +255,126 @@ def get_cutoff_time(settings: dict = None, manual: bool = False, channel: dict =
         cutoff = today_send - timedelta(days=1)
         return cutoff.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
 
-def parse_feed(feed_url: str, cutoff: datetime = None) -> list[dict]:
-    """Parse a single RSS feed and return recent articles."""
-    articles = []
-    if cutoff is None:
-        cutoff = datetime.now() - timedelta(hours=24)
+def get_fetch_budget(settings: dict = None, manual: bool = False, channel: dict = None) -> float:
+    """Get how many seconds the RSS fetch may take so the LLM stage starts on time.
 
-    try:
-        # Use requests to fetch content first (handles SSL better than feedparser's urllib)
-        try:
-            resp = requests.get(feed_url, timeout=10, headers={"User-Agent": "Mozilla/5.0"})
-            resp.raise_for_status()
-            feed = feedparser.parse(resp.content)
-        except requests.RequestException:
-            # Don't fallback to feedparser.parse(url) — it has no timeout and can hang
-            return []
-        source_name = feed.feed.get("title", feed_url)
-
-        for entry in feed.entries[:20]:  # Limit entries per feed
-            # Parse published time
-            published = None
-            if hasattr(entry, "published_parsed") and entry.published_parsed:
-                published = datetime(*entry.published_parsed[:6])
-            elif hasattr(entry, "updated_parsed") and entry.updated_parsed:
-                published = datetime(*entry.updated_parsed[:6])
-
-            # Skip if too old or no date
-            if published and published < cutoff:
-                continue
+    Args:
+        settings: Configuration dict
+        manual: If True, the plain fetch.run_deadline applies (no send time to meet)
+                If False, the fetch must end fetch.llm_lead_minutes before the send time
+        channel: Optional channel dict – uses its send_hour/send_minute if given.
+    """
+    if settings is None:
+        settings = load_settings()
+    options = get_fetch_options(settings)
+    if manual:
+        return options["run_deadline"]
 
-            articles.append({
-                "title": entry.get("title", ""),
-                "description": entry.get("summary", entry.get("description", ""))[:500],
-                "source": source_name,
-                "feed_url": feed_url,
-                "url": entry.get("link", ""),
-                "published": published.isoformat() if published else ""
-            })
-    except Exception as e:
-        print(f"  Warning: Failed to parse {feed_url}: {e}")
+    tz = ZoneInfo(settings.get("timezone", "Asia/Shanghai"))
+    send_hour, send_minute = get_send_time(settings, channel)
 
-    return articles
+    now = datetime.now(tz)
+    send_time = now.replace(hour=send_hour, minute=send_minute, second=0, microsecond=0)
+    if send_time < now - timedelta(hours=12):
+        # Fetch started before midnight for a send shortly after it
+        send_time += timedelta(days=1)
+    remaining = (send_time - timedelta(minutes=options["llm_lead_minutes"]) - now).total_seconds()
+    return min(options["run_deadline"], max(remaining, options["min_run_deadline"]))
+
+def refresh_articles(settings: dict = None, fresh: bool = False, budget: float = None) -> None:
+    """Top up the article store with one network pass over all feeds.
+
+    Always hits the network: entries published since the last poll belong
+    to today's window, and the next window starts at today's send time, so
+    skipping the pass would lose them for good.  When the store was polled
+    within fetch.poll_max_age (by the poller or an earlier run) the pass is
+    capped at fetch.topup_deadline seconds; conditional GETs make it mostly
+    304s.  Entries published between this pass and the send time still
+    fall in neither window (fetch.llm_lead_minutes bounds that gap).
+    One call serves every channel's time window (see fetch_raw_news).
 
-def fetch_raw_news(cutoff: datetime = None, settings: dict = None, max_per_source: int = 3, hardware_unlimited: bool = False) -> list[dict]:
-    """Fetch raw news from multiple RSS feeds in parallel.
+    Args:
+        settings: Settings dict
+        fresh: If True, always fetch (manual re-fetch)
+        budget: Seconds the fetch may take; feeds still running are cut off
+                (see get_fetch_budget). Defaults to fetch.run_deadline.
+    """
+    if settings is None:
+        settings = load_settings()
+
+    options = get_fetch_options(settings)
+    with ArticleStore() as store:
+        poll_age = store.last_poll_age()
+    topup = not fresh and poll_age is not None and poll_age <= options["poll_max_age"]
+    if topup:
+        budget = min(budget or options["run_deadline"], options["topup_deadline"])
+        print(f"  - 文章库: 上次抓取 {poll_age / 60:.0f} 分钟前, 增量补抓 (限时 {budget:.0f}s)")
+
+    feed_urls = get_rss_feeds(settings)
+    print(f"  - Using {len(feed_urls)} RSS feeds")
+
+    failed_feeds = []
+    timeout_feeds = []
+    cutoff_feeds = []
+    skipped_feeds = []
+
+    import time
+    rss_start = time.time()
+    # A top-up must see the feeds now, not a snapshot from before the last poll
+    snapshot = ingest(settings, digest_urls=feed_urls, fresh=fresh or topup, run_deadline=budget, consumer="digest")
+    for url in feed_urls:
+        # Feeds that failed this pass still contribute what earlier polls stored
+        stat = snapshot["feeds"].get(url, {})
+        if stat.get("status") == "timeout":
+            timeout_feeds.append(url)
+        elif stat.get("status") == "cutoff":
+            cutoff_feeds.append(url)
+        elif stat.get("status") == "skipped":
+            skipped_feeds.append(url)
+        elif stat.get("status") != "ok":
+            failed_feeds.append((url, stat.get("error", "")))
+
+    rss_elapsed = time.time() - rss_start
+    print(f"  - RSS 抓取耗时: {rss_elapsed:.1f}s")
+    ok_count = len(feed_urls) - len(failed_feeds) - len(timeout_feeds) - len(cutoff_feeds) - len(skipped_feeds)
+    print(f"  - 成功: {ok_count}, 超时: {len(timeout_feeds)}, 截止未完成: {len(cutoff_feeds)}, 失败: {len(failed_feeds)}, 熔断跳过: {len(skipped_feeds)}, {snapshot['cache']}")
+    if timeout_feeds:
+        print(f"  - 超时源: {[u.split('/')[-1][:25] for u in timeout_feeds[:5]]}")
+    if cutoff_feeds:
+        print(f"  - 截止未完成源: {[u.split('/')[-1][:25] for u in cutoff_feeds[:5]]}")
+    if failed_feeds:
+        print(f"  - 失败源: {[f[0].split('/')[-1][:25] for f in failed_feeds[:5]]}")
+
+def fetch_raw_news(cutoff: datetime = None, settings: dict = None, max_per_source: int = 3, hardware_unlimited: bool = False, fresh: bool = False, budget: float = None, until: datetime = None, refresh: bool = True) -> list[dict]:
+    """Fetch raw news from the RSS feeds in settings.
+
+    This is a windowed query over the article store (see article_store):
+    stored entries of the digest feeds published in [cutoff, until),
+    capped per source and deduplicated by URL in SQL.  With refresh the
+    store is topped up first (see refresh_articles).
 
     Args:
         cutoff: Only include articles published after this time
         settings: Settings dict
         max_per_source: Maximum articles to keep per source (ensures diversity)
         hardware_unlimited: If True, smart hardware sources are not limited (only for focused mode)
+        fresh: If True, never reuse a recent ingestion snapshot (manual re-fetch)
+        budget: Seconds the fetch may take (see refresh_articles)
+        until: Only include articles published before this time (default: no bound)
+        refresh: If False, only query the store (the caller already refreshed it)
     """
     if settings is None:
         settings = load_settings()
 
-    all_articles = []
+    if refresh:
+        refresh_articles(settings, fresh=fresh, budget=budget)
+
     feed_urls = get_rss_feeds(settings)
-    print(f"  - Using {len(feed_urls)} RSS feeds")
 
-    # Build feed_url → group mapping and per-group article limits
+    # Per-group article limits (source_limits)
     rss_feeds = settings.get("rss_feeds", [])
     source_limits = settings.get("source_limits", {})
     default_limit = source_limits.get("default", max_per_source)
-    feed_url_to_group = {}
-    for feed in rss_feeds:
-        if feed.get("enabled", True):
-            feed_url_to_group[feed.get("url", "")] = feed.get("group", "")
 
     # 获取智能硬件源的 URL 列表（仅聚焦模式下不受限制）
     hardware_urls = set()
@@ -310,218 +384,98 @@ def fetch_raw_news(cutoff: datetime = None, settings: dict = None, max_per_sourc
                 hardware_urls.add(feed.get("url", ""))
         print(f"  - Smart hardware sources (no limit): {len(hardware_urls)} feeds")
 
-    # Collect articles grouped by source
-    articles_by_source = {}
-
-    failed_feeds = []
-    timeout_feeds = []
-    empty_feeds = []
-
-    import time
-    rss_start = time.time()
+    if cutoff is None:
+        cutoff = datetime.now() - timedelta(hours=24)
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(parse_feed, url, cutoff): url for url in feed_urls}
-
-        for future in as_completed(futures):
-            url = futures[future]
-            try:
-                articles = future.result()
-                if not articles:
-                    empty_feeds.append(url)
-                for article in articles:
-                    source = article.get("source", "unknown")
-                    if source not in articles_by_source:
-                        articles_by_source[source] = []
-                    articles_by_source[source].append(article)
-            except Exception as e:
-                err_str = str(e).lower()
-                if 'timeout' in err_str or 'timed out' in err_str:
-                    timeout_feeds.append(url)
-                else:
-                    failed_feeds.append((url, str(e)))
+    # Time window, per-source limits and URL dedup are one indexed query
+    with ArticleStore() as store:
+        feed_counts = store.count_by("feed_url", cutoff, feed_urls, until)
+        source_counts = store.count_by("source", cutoff, feed_urls, until)
+        all_articles, duplicates = store.select(cutoff, feed_urls, source_limits, default_limit, hardware_urls, until)
 
-    rss_elapsed = time.time() - rss_start
-    print(f"  - RSS 抓取耗时: {rss_elapsed:.1f}s")
-    print(f"  - 成功: {len(feed_urls) - len(failed_feeds) - len(timeout_feeds) - len(empty_feeds)}, 空: {len(empty_feeds)}, 超时: {len(timeout_feeds)}, 失败: {len(failed_feeds)}")
-    if timeout_feeds:
-        print(f"  - 超时源: {[u.split('/')[-1][:25] for u in timeout_feeds[:5]]}")
-    if failed_feeds:
-        print(f"  - 失败源: {[f[0].split('/')[-1][:25] for f in failed_feeds[:5]]}")
+    empty_feeds = [url for url in feed_urls if not feed_counts.get(url)]
+    print(f"  - 窗口内有文章的源: {len(feed_urls) - len(empty_feeds)}, 空: {len(empty_feeds)}")
 
-    # Limit articles per source and merge
-    # 聚焦模式：智能硬件源不受限制；泛AI模式：所有源均受限制
+    # 聚焦模式：智能硬件源不受限制；泛AI模式：所有源均受限制 (see ArticleStore.select)
     hardware_article_count = 0
-    for source, articles in articles_by_source.items():
-        # Sort by published time within source
-        articles.sort(key=lambda x: x.get("published", ""), reverse=True)
-
-        # 检查是否是智能硬件源（通过 feed_url 精确匹配）
-        is_hardware = hardware_unlimited and any(
-            a.get("feed_url", "") in hardware_urls for a in articles
-        ) if hardware_urls else False
-
-        if is_hardware:
-            # 智能硬件源：全部保留（仅聚焦模式）
-            all_articles.extend(articles)
-            hardware_article_count += len(articles)
-        else:
-            # 其他源：按组限制数量
-            feed_url = articles[0].get("feed_url", "") if articles else ""
-            group = feed_url_to_group.get(feed_url, "")
-            limit = source_limits.get(group, default_limit)
-            all_articles.extend(articles[:limit])
-
-    # Sort all by published time (newest first)
-    all_articles.sort(key=lambda x: x.get("published", ""), reverse=True)
-
-    # Deduplicate by URL (keep first = newest due to sort above)
-    seen_urls = set()
-    deduped = []
     for article in all_articles:
-        url = article.get("url", "")
-        if url and url in seen_urls:
-            continue
-        if url:
-            seen_urls.add(url)
-        deduped.append(article)
-    if len(deduped) < len(all_articles):
-        print(f"  - RSS dedup: removed {len(all_articles) - len(deduped)} duplicate URLs")
-    all_articles = deduped
-
-    print(f"  - Sources with articles: {len(articles_by_source)}")
+        hardware_article_count += article.pop("unlimited")
+        article["description"] = article["description"][:500]
+    if duplicates:
+        print(f"  - RSS dedup: removed {duplicates} duplicate URLs")
+
+    print(f"  - Sources with articles: {len(source_counts)}")
     if hardware_unlimited:
         print(f"  - Smart hardware articles (unlimited): {hardware_article_count}")
     # Show top sources by article count
-    source_counts = [(src, len(arts)) for src, arts in articles_by_source.items()]
-    source_counts.sort(key=lambda x: -x[1])
-    print(f"  - Top sources: {source_counts[:10]}")
+    top_sources = sorted(source_counts.items(), key=lambda x: -x[1])
+    print(f"  - Top sources: {top_sources[:10]}")
 
     # Cluster by title similarity and annotate coverage
-    all_articles = _cluster_and_annotate(all_articles)
+    all_articles = _cluster_and_annotate(all_articles, settings.get("timezone", "Asia/Shanghai"))
 
     return all_articles
 
 
-def _title_tokens(title: str) -> set:
-    """Normalize title into a set of tokens for similarity comparison."""
-    import re
-    # Remove punctuation, lowercase, split
-    title = re.sub(r'[^\w\s]', ' ', title.lower())
-    # Remove very short tokens (articles, prepositions)
-    return {t for t in title.split() if len(t) > 1}
-
-
-def _title_similarity(tokens_a: set, tokens_b: set) -> float:
-    """Jaccard similarity between two token sets."""
-    if not tokens_a or not tokens_b:
-        return 0.0
-    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
-
+def _cluster_and_annotate(articles: list[dict], tz_name: str = "Asia/Shanghai") -> list[dict]:
+    """Assign articles to persistent stories, annotate each with coverage info.
 
-def _cluster_and_annotate(articles: list[dict]) -> list[dict]:
-    """Cluster articles by title similarity, annotate each with coverage info.
-
-    Articles covering the same event (from different sources) get:
-    - coverage_count: number of sources reporting this event
+    Articles covering the same event (from different sources, in this or
+    earlier runs) share a story (see story_index) and get:
+    - story_id: ID of the story, stable across runs
+    - coverage_count: number of sources that have reported this story
     - coverage_sources: list of source names
-    - is_primary: True if this is the representative article for the cluster
+    - story_first_seen: when the story was first seen
+    - is_primary: True if this is the representative article for the story in this run
     """
     if not articles:
         return articles
 
-    # Build token sets for all titles
-    title_tokens = []
-    for a in articles:
-        title_tokens.append(_title_tokens(a.get("title", "")))
-
-    # Greedy clustering: assign each article to existing cluster or create new one
-    clusters = []  # list of lists of article indices
-    cluster_tokens = []  # representative tokens for each cluster
-    SIMILARITY_THRESHOLD = 0.35
-
-    for i, tokens in enumerate(title_tokens):
-        best_cluster = -1
-        best_sim = 0.0
-        for ci, ct in enumerate(cluster_tokens):
-            sim = _title_similarity(tokens, ct)
-            if sim > best_sim:
-                best_sim = sim
-                best_cluster = ci
-        if best_sim >= SIMILARITY_THRESHOLD:
-            clusters[best_cluster].append(i)
-            # Expand cluster tokens with new article's tokens
-            cluster_tokens[best_cluster] = cluster_tokens[best_cluster] | tokens
-        else:
-            clusters.append([i])
-            cluster_tokens.append(tokens)
+    stories = StoryIndex(tz_name=tz_name)
+    known = len(stories)
+    clusters = {}  # story id -> article indices, in first-seen order
+    for i, a in enumerate(articles):
+        clusters.setdefault(stories.assign(a), []).append(i)
+    stories.save()
 
     # Annotate articles
-    for cluster in clusters:
-        sources = []
-        for idx in cluster:
-            src = articles[idx].get("source", "unknown")
-            if src not in sources:
-                sources.append(src)
-        count = len(sources)
+    for sid, cluster in clusters.items():
+        story = stories.story(sid)
         for j, idx in enumerate(cluster):
-            articles[idx]["coverage_count"] = count
-            articles[idx]["coverage_sources"] = sources
+            articles[idx]["story_id"] = sid
+            articles[idx]["coverage_count"] = len(story["sources"])
+            articles[idx]["coverage_sources"] = story["sources"]
+            articles[idx]["story_first_seen"] = story["first_seen"]
             articles[idx]["is_primary"] = (j == 0)  # first in cluster is primary
 
-    # Sort: higher coverage first, then by published time
-    articles.sort(key=lambda x: (-x.get("coverage_count", 1), x.get("published", "")), reverse=False)
+    # Sort: higher coverage first, then newest first
+    articles.sort(key=lambda x: x.get("published", ""), reverse=True)
+    articles.sort(key=lambda x: -x.get("coverage_count", 1))
 
-    multi = sum(1 for c in clusters if len(c) > 1)
-    if multi:
-        print(f"  - Event clustering: {len(clusters)} events from {len(articles)} articles, {multi} multi-source events")
+    multi = sum(1 for sid in clusters if len(stories.story(sid)["sources"]) > 1)
+    print(f"  - Event clustering: {len(clusters)} stories from {len(articles)} articles, "
+          f"{multi} multi-source, {len(stories) - known} new")
 
     return articles
 
 
 def apply_filters(articles: list[dict], settings: dict = None) -> list[dict]:
-    """Apply blacklist/whitelist filters from settings to articles."""
+    """Apply blacklist/whitelist filters from settings to articles (see filter_rules).
+
+    Kept articles get ``matched_rules`` (the filter lists they matched),
+    ``matched_keywords`` (the keywords they hit) and ``boosted`` (matched a
+    whitelist); the ranker scores the last two.
+    """
     if settings is None:
         settings = load_settings()
-    filters = settings.get("filters", {})
-    blacklist_kw = [kw.lower() for kw in filters.get("blacklist_keywords", [])]
-    blacklist_src = [src.lower() for src in filters.get("blacklist_sources", [])]
-    whitelist_kw = [kw.lower() for kw in filters.get("whitelist_keywords", [])]
-    whitelist_src = [src.lower() for src in filters.get("whitelist_sources", [])]
-
-    if not any([blacklist_kw, blacklist_src, whitelist_kw, whitelist_src]):
+    plan = RulePlan(settings.get("filters", {}))
+    if not plan:
         return articles
 
-    filtered = []
-    for article in articles:
-        title = (article.get("title", "") or "").lower()
-        desc = (article.get("description", "") or "").lower()
-        source = (article.get("source", "") or "").lower()
-        text = title + " " + desc
-
-        # Blacklist: skip if matches
-        if any(kw in text for kw in blacklist_kw):
-            continue
-        if any(src in source for src in blacklist_src):
-            continue
-
-        filtered.append(article)
-
-    # Whitelist: boost matching articles to the front
-    if whitelist_kw or whitelist_src:
-        boosted = []
-        normal = []
-        for article in filtered:
-            title = (article.get("title", "") or "").lower()
-            desc = (article.get("description", "") or "").lower()
-            source = (article.get("source", "") or "").lower()
-            text = title + " " + desc
-            if any(kw in text for kw in whitelist_kw) or any(src in source for src in whitelist_src):
-                boosted.append(article)
-            else:
-                normal.append(article)
-        filtered = boosted + normal
-
+    # Blacklist: skip if matches; whitelist: boost matching articles to the front
+    filtered = plan.apply(articles)
+    if plan.rejected:
+        print(f"  - Filters dropped: {plan.summary()}")
     return filtered
 
 def get_prompt_for_mode(mode: str, articles_text: str, max_items: int, category_names: str, category_json_example: str, icon_mapping: str, custom_prompt: str = None, paywalled_sources: str = "", previously_reported: str = "") -> str:
@@ -729,33 +683,61 @@ def get_prompt_for_mode(mode: str, articles_text: str, max_items: int, category_
 - 确保所有字符串中的双引号用单引号替换"""
 
 
-def _call_deepseek(prompt: str, label: str) -> str:
-    """Call DeepSeek V3 API and return response text. Returns None on failure."""
+def _stream_result(parser: JSONStreamParser, truncated: bool, label: str, backend: str) -> tuple:
+    """(text, parsed, status) for a finished or aborted stream (see _call_deepseek)."""
+    if parser.error:
+        print(f"  - {backend} ({label}) aborted: {parser.error}")
+        return parser.text, None, "aborted"
+    if truncated:
+        print(f"  - WARNING: Response was truncated (hit max_tokens), keeping {len(parser.items)} complete news items")
+        return parser.text, parser.result(), "truncated"
+    return parser.text, parser.result(), "complete"
+
+
+def _call_deepseek(prompt: str, label: str) -> tuple:
+    """Stream a DeepSeek V3 completion through the incremental JSON parser (see json_stream).
+
+    Returns (text, parsed or None, status) with status "complete", "truncated"
+    or "aborted" (unrecoverable structure, stream closed early);
+    (None, None, "error") on failure.
+    """
     import time
     import re
     from openai import OpenAI as OpenAIClient
 
     api_key = os.environ.get("DEEPSEEK_API_KEY")
     if not api_key:
-        return None
+        return None, None, "error"
 
     client = OpenAIClient(api_key=api_key, base_url="https://api.deepseek.com")
     start = time.time()
+    parser = JSONStreamParser()
+    finish_reason = None
     try:
-        resp = client.chat.completions.create(
-            model="deepseek-chat",
+        stream = client.chat.completions.create(
+            model=DEEPSEEK_MODEL,
             max_tokens=8192,
             messages=[{"role": "user", "content": prompt}],
+            stream=True,
         )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                parser.feed(choice.delta.content)
+                if parser.error:
+                    stream.close()
+                    break
+            finish_reason = choice.finish_reason or finish_reason
         elapsed = time.time() - start
-        print(f"  - DeepSeek ({label}) 耗时: {elapsed:.1f}s")
-        text = resp.choices[0].message.content
+        print(f"  - DeepSeek ({label}) 耗时: {elapsed:.1f}s, {len(parser.items)} news items streamed")
+        text, parsed, status = _stream_result(parser, finish_reason == "length", label, "DeepSeek")
         # Strip <think> tags if present
-        text = re.sub(r'<think>[\s\S]*?</think>', '', text).strip()
-        return text
+        return re.sub(r'<think>[\s\S]*?</think>', '', text).strip(), parsed, status
     except Exception as e:
         print(f"  - DeepSeek ({label}) error: {e}")
-        return None
+        return None, None, "error"
 
 
 def _parse_json_response(response_text: str):
@@ -834,78 +816,88 @@ def _parse_json_response(response_text: str):
         return None
 
 
-def _call_haiku(client, prompt: str, label: str) -> str:
-    """Call Claude Haiku and return response text. Returns None on failure."""
+def _call_haiku(client, prompt: str, label: str) -> tuple:
+    """Stream a Claude Haiku completion through the incremental JSON parser.
+
+    Same return value as _call_deepseek.
+    """
     import time
+    parser = JSONStreamParser()
     try:
         start = time.time()
-        resp = client.messages.create(
-            model="claude-haiku-4-5-20251001",
+        with client.messages.stream(
+            model=HAIKU_MODEL,
             max_tokens=8192,
             messages=[{"role": "user", "content": prompt}],
-        )
+        ) as stream:
+            for text in stream.text_stream:
+                parser.feed(text)
+                if parser.error:
+                    break
+            stop_reason = None if parser.error else stream.get_final_message().stop_reason
         elapsed = time.time() - start
-        print(f"  - Haiku ({label}) {elapsed:.1f}s, stop_reason: {resp.stop_reason}")
-        if resp.stop_reason == "max_tokens":
-            print(f"  - WARNING: Response was truncated (hit max_tokens)")
-        return resp.content[0].text
+        print(f"  - Haiku ({label}) {elapsed:.1f}s, stop_reason: {stop_reason}, {len(parser.items)} news items streamed")
+        return _stream_result(parser, stop_reason == "max_tokens", label, "Haiku")
     except Exception as e:
         print(f"  - Haiku ({label}) error: {e}")
-        return None
+        return None, None, "error"
 
 
-def _call_ai(prompt: str, label: str, anthropic_client=None) -> str:
-    """Call the best available AI backend. Tries DeepSeek first, falls back to Haiku.
+def _call_ai(prompt: str, label: str, anthropic_client=None, fresh: bool = False) -> tuple:
+    """Call the best available AI backend and parse its JSON. Tries DeepSeek first, falls back to Haiku.
 
-    Returns response text, or None if all backends fail.
+    Returns (response text, parsed dict); text is None if all backends fail,
+    parsed is None if the response isn't valid JSON or the stream was aborted.
+    A truncated response yields its complete news items.  Complete parsed
+    responses are cached per (backend, model, prompt) unless ``fresh`` (see llm_cache).
     """
+    cache = get_llm_cache()
+    backends = []
     if os.environ.get("DEEPSEEK_API_KEY"):
-        result = _call_deepseek(prompt, label)
-        if result:
-            return result
-        print(f"  - DeepSeek failed for {label}, trying Haiku fallback...")
+        backends.append(("deepseek", DEEPSEEK_MODEL))
     if anthropic_client:
-        return _call_haiku(anthropic_client, prompt, label)
-    print(f"  - No AI backend available for {label}")
-    return None
-
-
-def _load_recent_titles(settings: dict, days: int = 2) -> list[str]:
-    """Load news titles from recent drafts for cross-day dedup.
-
-    Scans the last N days' draft files (excluding today) and extracts
-    all news titles that were already sent or are pending.
-    """
-    drafts_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "drafts")
-    if not os.path.exists(drafts_dir):
-        return []
+        backends.append(("haiku", HAIKU_MODEL))
 
-    tz_name = settings.get("timezone", "Asia/Shanghai")
-    tz = ZoneInfo(tz_name)
-
-    titles = set()
-    try:
-        all_files = os.listdir(drafts_dir)
-    except OSError:
-        return []
-
-    for d in range(1, days + 1):
-        date_str = (datetime.now(tz) - timedelta(days=d)).strftime("%Y-%m-%d")
-        for filename in all_files:
-            if filename.startswith(date_str) and filename.endswith(".json"):
-                try:
-                    filepath = os.path.join(drafts_dir, filename)
-                    with open(filepath, "r", encoding="utf-8") as f:
-                        draft = json.load(f)
-                    for cat in draft.get("categories", []):
-                        for news in cat.get("news", []):
-                            title = news.get("title", "").strip()
-                            if title:
-                                titles.add(title)
-                except (json.JSONDecodeError, IOError):
-                    pass
-
-    return sorted(titles)
+    if not fresh and not llm_cache_bypassed():
+        for backend, model in backends:
+            cached = cache.get(backend, model, prompt)
+            parsed = _parse_json_response(cached) if cached else None
+            if parsed:
+                print(f"  - LLM cache hit ({label}, {backend})")
+                return cached, parsed
+
+    for backend, model in backends:
+        if backend == "deepseek":
+            with _llm_slots:
+                result, parsed, status = _call_deepseek(prompt, label)
+            if not result:
+                print(f"  - DeepSeek failed for {label}, trying Haiku fallback...")
+                continue
+        else:
+            with _llm_slots:
+                result, parsed, status = _call_haiku(anthropic_client, prompt, label)
+            if not result:
+                return None, None
+        if status == "aborted":
+            return result, None
+        if parsed is None:
+            # Complete but not parsed as it streamed (e.g. unescaped quotes): repair passes
+            parsed = _parse_json_response(result)
+        if parsed and status == "complete":
+            cache.put(backend, model, prompt, result)
+        return result, parsed
+    if not backends:
+        print(f"  - No AI backend available for {label}")
+    return None, None
+
+
+def _load_sent_index(settings: dict) -> SentIndex:
+    """Sent-news fingerprints, caught up with drafts sent by other runs (see sent_index)."""
+    index = SentIndex(tz_name=settings.get("timezone", "Asia/Shanghai"))
+    lookback_days = get_lookback_days(settings)
+    if index.sync(lookback_days=lookback_days):
+        index.save(lookback_days)
+    return index
 
 
 def _format_previously_reported(titles: list[str]) -> str:
@@ -924,30 +916,36 @@ def _format_previously_reported(titles: list[str]) -> str:
 """
 
 
-def _format_articles_text(articles: list[dict]) -> str:
-    """Format a list of article dicts into text for Claude prompts."""
-    text = ""
-    for i, article in enumerate(articles, 1):
-        coverage = article.get('coverage_count', 1)
-        coverage_line = ""
-        if coverage > 1:
-            sources = ", ".join(article.get('coverage_sources', []))
-            coverage_line = f"\nCoverage: {coverage} sources ({sources}) ★"
-        text += f"""
----
-Article {i}:
-Title: {article.get('title', '')}
-Source: {article.get('source', '')}{coverage_line}
-Published: {article.get('published', '')}
-Description: {article.get('description', '')}
-URL: {article.get('url', '')}
-"""
+def _collapse_clusters(articles: list[dict]) -> list[dict]:
+    """One entry per story: its primary article, with the others listed as ``alternates``.
+
+    Keeps the order of each story's first article; articles without a
+    story_id are kept as they are.
+    """
+    groups = {}
+    for i, article in enumerate(articles):
+        groups.setdefault(article.get("story_id", ("article", i)), []).append(article)
+    events = []
+    for group in groups.values():
+        primary = next((a for a in group if a.get("is_primary")), group[0])
+        alternates = [{"source": a.get("source", ""), "url": a.get("url", "")} for a in group if a is not primary]
+        events.append({**primary, "alternates": alternates})
+    return events
+
+
+def _pack_prompt_articles(articles: list[dict], settings: dict, mode: str) -> str:
+    """Article blocks for one prompt, within the mode's token budget (see prompt_packer)."""
+    budget = get_token_budget(settings, mode)
+    text, _, stats = pack_articles(articles, budget)
+    print(f"  - Prompt packing ({mode}): {stats['articles']}/{stats['candidates']} articles, "
+          f"~{stats['tokens']} tokens (budget {budget}), {stats['shortened']} descriptions shortened")
     return text
 
 
 def _focused_split_call(client, articles: list[dict], max_items: int, paywalled_sources: str, settings: dict, previously_reported: str = "") -> list[dict]:
-    """Focused mode: two sequential AI calls for hardware and AI/industry, then merge."""
+    """Focused mode: hardware and AI/industry AI calls run concurrently, then merge."""
     import time
+    from concurrent.futures import ThreadPoolExecutor
 
     print(f"  - Focused mode: 2 AI calls (hardware + AI/industry)")
 
@@ -961,10 +959,10 @@ def _focused_split_call(client, articles: list[dict], max_items: int, paywalled_
     other_articles = [a for a in articles if a.get("feed_url", "") not in hw_urls]
     print(f"  - Article split: {len(hw_articles)} hardware, {len(other_articles)} other")
 
-    other_articles_text = _format_articles_text(other_articles) if other_articles else _format_articles_text(articles)
+    other_articles_text = _pack_prompt_articles(other_articles or articles, settings, "focused_ai_industry")
 
     if hw_articles:
-        hw_articles_text = _format_articles_text(hw_articles)
+        hw_articles_text = _pack_prompt_articles(hw_articles, settings, "focused_hardware")
         hw_budget = 10  # hardware gets 7-10 items
         ai_budget = max(max_items - hw_budget, 5)  # rest goes to AI+industry, at least 5
         prompt_hw = get_prompt_for_mode("focused_hardware", hw_articles_text, max_items, "", "", "", None, paywalled_sources, previously_reported)
@@ -986,18 +984,22 @@ def _focused_split_call(client, articles: list[dict], max_items: int, paywalled_
             if attempt > 0:
                 print(f"  - Retrying {label} (attempt {attempt + 1})...")
                 time.sleep(3)
-            resp = _call_ai(prompt, f"{label}" if attempt == 0 else f"{label}-retry{attempt}", anthropic_client=client)
+            resp, parsed = _call_ai(prompt, f"{label}" if attempt == 0 else f"{label}-retry{attempt}",
+                                    anthropic_client=client, fresh=attempt > 0)
             if not resp:
                 print(f"  - {label}: API call returned None")
                 continue
-            parsed = _parse_json_response(resp)
             if parsed:
                 return parsed
             print(f"  - {label}: JSON parse failed. Preview: {resp[:200]}")
         return None
 
-    hw_parsed = _call_and_parse(prompt_hw, "智能硬件") if prompt_hw else None
-    ai_parsed = _call_and_parse(prompt_ai, "AI+行业")
+    # Both calls (with their retries) in parallel; URL dedup merges the results below
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        hw_future = executor.submit(_call_and_parse, prompt_hw, "智能硬件") if prompt_hw else None
+        ai_future = executor.submit(_call_and_parse, prompt_ai, "AI+行业")
+        hw_parsed = hw_future.result() if hw_future else None
+        ai_parsed = ai_future.result()
 
     elapsed = time.time() - start
     print(f"  - Focused split total 耗时: {elapsed:.1f}s")
@@ -1016,12 +1018,10 @@ def _focused_split_call(client, articles: list[dict], max_items: int, paywalled_
         print(f"  - 🥽 智能硬件: all attempts failed")
 
     # Collect URLs from hardware for dedup
-    seen_urls = set()
+    seen_urls = DedupIndex()
     for cat in categories:
         for news in cat.get("news", []):
-            url = news.get("url", "")
-            if url:
-                seen_urls.add(url)
+            seen_urls.add(news.get("url", ""))
 
     if ai_parsed:
         ai_cats = ai_parsed.get("categories", [])
@@ -1082,23 +1082,22 @@ def summarize_news_with_claude(anthropic_key: str, articles: list[dict], max_ite
     else:
         print(f"  - Topic mode: {topic_mode}")
 
-    # Prepare articles for Claude
-    articles_text = ""
-    for i, article in enumerate(articles[:120], 1):  # Limit to 120 articles for diversity
-        coverage = article.get('coverage_count', 1)
-        coverage_line = ""
-        if coverage > 1:
-            sources = ", ".join(article.get('coverage_sources', []))
-            coverage_line = f"\nCoverage: {coverage} sources ({sources}) ★"
-        articles_text += f"""
----
-Article {i}:
-Title: {article.get('title', '')}
-Source: {article.get('source', '')}
-Published: {article.get('published', '')}{coverage_line}
-Description: {article.get('description', '')}
-URL: {article.get('url', '')}
-"""
+    # One block per story: the primary article plus its alternate sources
+    if settings.get("collapse_clusters", True):
+        collapsed = _collapse_clusters(articles)
+        if len(collapsed) < len(articles):
+            print(f"  - Prompt: {len(articles)} articles collapsed into {len(collapsed)} events")
+        articles = collapsed
+
+    # Rank candidates, diverse top set first (see ranker); the token budget decides how many are sent
+    prompt_max = settings.get("prompt_max_articles", PROMPT_MAX_ARTICLES)
+    boost_groups = (PRIORITY_GROUP,) if topic_mode == "focused" else ()
+    articles = rank_candidates(articles, prompt_max, boost_groups, settings.get("ranking"))
+    print(f"  - Ranked candidates: {len(articles)}")
+
+    # Prepare articles for Claude (focused mode packs its two split prompts separately)
+    focused_split = topic_mode == "focused" and not custom_prompt
+    articles_text = "" if focused_split else _pack_prompt_articles(articles, settings, topic_mode)
 
     category_names = "、".join(c["name"] for c in categories)
     category_json_example = json.dumps(
@@ -1117,20 +1116,21 @@ URL: {article.get('url', '')}
     if paywalled_sources:
         print(f"  - Paywalled sources: {paywalled_sources}")
 
-    # Load recently reported titles for cross-day dedup
-    recent_titles = _load_recent_titles(settings)
+    # Recently sent titles: a hint for follow-ups under a different URL
+    # (exact repeats were already dropped in fetch_news, which also synced the index)
+    recent_titles = SentIndex(tz_name=settings.get("timezone", "Asia/Shanghai")).recent_titles(days=2)
     previously_reported = _format_previously_reported(recent_titles)
     if recent_titles:
-        print(f"  - Cross-day dedup: {len(recent_titles)} titles from recent drafts")
+        print(f"  - Cross-day dedup: {len(recent_titles)} titles from recently sent drafts")
 
     prompt = get_prompt_for_mode(topic_mode, articles_text, max_items, category_names, category_json_example, icon_mapping, custom_prompt, paywalled_sources, previously_reported)
 
     import time
     claude_start = time.time()
 
-    # Focused mode: split into 2 parallel calls (hardware + AI/industry)
+    # Focused mode: split into 2 concurrent calls (hardware + AI/industry)
     if prompt is None and topic_mode == "focused":
-        return _focused_split_call(client, articles[:120], max_items, paywalled_sources, settings, previously_reported)
+        return _focused_split_call(client, articles, max_items, paywalled_sources, settings, previously_reported)
 
     # Retry logic (matches focused mode's _call_and_parse behavior)
     max_retries = 2
@@ -1139,7 +1139,7 @@ URL: {article.get('url', '')}
             print(f"  - Retrying {topic_mode} mode (attempt {attempt + 1})...")
             time.sleep(3)
 
-        response_text = _call_ai(prompt, topic_mode, anthropic_client=client)
+        response_text, parsed = _call_ai(prompt, topic_mode, anthropic_client=client, fresh=attempt > 0)
         if not response_text:
             print(f"  - {topic_mode}: AI call returned None (attempt {attempt + 1})")
             continue
@@ -1147,7 +1147,6 @@ URL: {article.get('url', '')}
         claude_elapsed = time.time() - claude_start
         print(f"  - AI ({topic_mode}) 耗时: {claude_elapsed:.1f}s")
 
-        parsed = _parse_json_response(response_text)
         if parsed:
             categories_result = parsed.get("categories", [])
             if categories_result:
@@ -1160,7 +1159,7 @@ URL: {article.get('url', '')}
     print(f"  Error: All {max_retries + 1} attempts failed for {topic_mode} mode")
     return []
 
-def fetch_news(anthropic_key: str = "", topic: str = "AI/科技", max_items: int = 10, settings: dict = None, manual: bool = False, hardware_unlimited: bool = None, channel: dict = None) -> dict:
+def fetch_news(anthropic_key: str = "", topic: str = "AI/科技", max_items: int = 10, settings: dict = None, manual: bool = False, hardware_unlimited: bool = None, channel: dict = None, prefetched: bool = False, summarize: bool = True) -> dict:
     """Fetch and process news.
 
     Args:
@@ -1171,6 +1170,10 @@ def fetch_news(anthropic_key: str = "", topic: str = "AI/科技", max_items: int
         manual: If True, use current time as window end (manual trigger)
         hardware_unlimited: Override for hardware source limiting. If None, auto-detect from topic_mode.
         channel: Optional channel dict for time window calculation.
+        prefetched: If True, the caller already refreshed the article store
+                    (see refresh_articles); only this channel's window is queried.
+        summarize: If False, stop before the AI call (categories empty); pass the
+                   result to summarize_news later, e.g. from a worker thread.
 
     Returns dict with categories and _raw_articles (for multi-channel reuse).
     """
@@ -1183,8 +1186,13 @@ def fetch_news(anthropic_key: str = "", topic: str = "AI/科技", max_items: int
     today = datetime.now(tz).strftime("%Y-%m-%d")
     start_time, end_time = get_time_window(settings, manual=manual, channel=channel)
     cutoff = get_cutoff_time(settings, manual=manual, channel=channel)
+    budget = None
+    if not prefetched:
+        budget = get_fetch_budget(settings, manual=manual, channel=channel)
 
     print(f"  - Time window: {start_time} ~ {end_time}")
+    if budget is not None:
+        print(f"  - Fetch budget: {budget:.0f}s")
 
     # 聚焦模式下，智能硬件源不受数量限制
     if hardware_unlimited is None:
@@ -1192,13 +1200,29 @@ def fetch_news(anthropic_key: str = "", topic: str = "AI/科技", max_items: int
         hardware_unlimited = (topic_mode == "focused")
 
     print("  - Fetching news from RSS feeds...")
-    raw_articles = fetch_raw_news(cutoff=cutoff, settings=settings, hardware_unlimited=hardware_unlimited)
+    raw_articles = fetch_raw_news(cutoff=cutoff, settings=settings, hardware_unlimited=hardware_unlimited, fresh=manual,
+                                  budget=budget, until=cutoff + timedelta(days=1), refresh=not prefetched)
     print(f"  - Got {len(raw_articles)} raw articles")
 
     # Apply blacklist/whitelist filters
     raw_articles = apply_filters(raw_articles, settings)
     print(f"  - After filtering: {len(raw_articles)} articles")
 
+    # Cross-day dedup: drop anything already sent within the look-back window
+    lookback_days = get_lookback_days(settings)
+    sent_index = _load_sent_index(settings)
+    raw_articles, already_sent = sent_index.filter(raw_articles, lookback_days)
+    if already_sent:
+        print(f"  - Cross-day dedup: dropped {already_sent} articles sent in the last {lookback_days} days")
+
+    # Story-level: only stories with coverage newer than their last send (see story_index)
+    since = (datetime.now(tz) - timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+    sent_stories = StoryIndex(tz_name=tz_name).already_sent(sent_index, since, today)
+    before = len(raw_articles)
+    raw_articles = [a for a in raw_articles if a.get("story_id") not in sent_stories]
+    if len(raw_articles) < before:
+        print(f"  - Story dedup: dropped {before - len(raw_articles)} articles of sent stories without new coverage")
+
     if not raw_articles:
         return {
             "date": today,
@@ -1208,23 +1232,41 @@ def fetch_news(anthropic_key: str = "", topic: str = "AI/科技", max_items: int
             "error": "No articles fetched from RSS feeds"
         }
 
+    news_data = {
+        "date": today,
+        "time_window": f"{start_time} ~ {end_time}",
+        "categories": [],
+        "_raw_articles": raw_articles,
+    }
+    if not summarize:
+        return news_data
+    return summarize_news(anthropic_key, news_data, max_items, settings)
+
+
+def summarize_news(anthropic_key: str, news_data: dict, max_items: int = 10, settings: dict = None) -> dict:
+    """AI stage of fetch_news: summarize ``news_data["_raw_articles"]`` and dedup URLs.
+
+    Only reads the on-disk indexes (the LLM cache is locked), so several
+    modes can run concurrently.
+    Returns news_data with its categories filled in.
+    """
+    if settings is None:
+        settings = load_settings()
+
     backend = "DeepSeek" if os.environ.get("DEEPSEEK_API_KEY") else "Claude"
     print(f"  - Summarizing with {backend}...")
-    categories = summarize_news_with_claude(anthropic_key, raw_articles, max_items, settings)
+    categories = summarize_news_with_claude(anthropic_key, news_data["_raw_articles"], max_items, settings)
 
     # Post-AI dedup: remove duplicate URLs across categories
-    seen_urls = set()
+    seen_urls = DedupIndex()
     dedup_removed = 0
     for cat in categories:
         original = cat.get("news", [])
         unique = []
         for news in original:
-            url = news.get("url", "")
-            if url and url in seen_urls:
+            if not seen_urls.add(news.get("url", "")):
                 dedup_removed += 1
                 continue
-            if url:
-                seen_urls.add(url)
             unique.append(news)
         cat["news"] = unique
     # Remove empty categories after dedup
@@ -1235,12 +1277,7 @@ def fetch_news(anthropic_key: str = "", topic: str = "AI/科技", max_items: int
     total = sum(len(c.get("news", [])) for c in categories)
     print(f"  - Selected {total} top news in {len(categories)} categories")
 
-    return {
-        "date": today,
-        "time_window": f"{start_time} ~ {end_time}",
-        "categories": categories,
-        "_raw_articles": raw_articles,
-    }
+    return {**news_data, "categories": categories}
 
 def save_draft(news_data: dict, settings: dict = None, channel_id: str = None) -> str:
     """Save news data as a draft JSON file.
@@ -1265,6 +1302,14 @@ def save_draft(news_data: dict, settings: dict = None, channel_id: str = None) -
         filename = f"{date}.json"
     draft_path = os.path.join(drafts_dir, filename)
 
+    # Fingerprint sent news for cross-day dedup (see sent_index)
+    if news_data.get("status") == "sent":
+        tz = ZoneInfo(settings.get("timezone", "Asia/Shanghai"))
+        news_data.setdefault("sent_at", datetime.now(tz).isoformat(timespec="seconds"))
+        sent_index = SentIndex(tz_name=settings.get("timezone", "Asia/Shanghai"))
+        sent_index.add_draft(news_data, filename)
+        sent_index.save(get_lookback_days(settings))
+
     # Never overwrite a draft that's already been sent or rejected
     if os.path.exists(draft_path):
         try:
@@ -3,15 +3,14 @@
 RSS 聚合器 - GitHub Actions 每日在云上跑
 输入：config/rss-feeds.json
 输出：rss-outputs/YYYY-MM-DD.json
+注意：每个源只取前 50 条（feed_engine.MAX_ENTRIES，流式下载到第 50 条即停），更多条目不会进入聚合
 """
 import json
-import os
-import re
-import time
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
 
-import feedparser
+from ingest import group_by_feed, ingest
+from filter_rules import RulePlan
 
 ROOT = Path(__file__).parent.parent
 CONFIG = ROOT / "config" / "rss-feeds.json"
@@ -23,8 +22,8 @@ NOW = datetime.now(timezone(timedelta(hours=8)))
 TODAY = NOW.strftime("%Y-%m-%d")
 OUT_FILE = OUT_DIR / f"{TODAY}.json"
 
-# 时效窗口：只收最近 36 小时内的新闻（覆盖上游偶尔延迟推送）
-CUTOFF = datetime.utcnow() - timedelta(hours=36)
+# 默认时效窗口：filter_rules 未配置 require_recency_days 时只收最近 36 小时（覆盖上游偶尔延迟推送）
+DEFAULT_RECENCY_DAYS = 1.5
 
 
 def load_config():
@@ -32,20 +31,15 @@ def load_config():
         return json.load(f)
 
 
-def entry_pub_time(entry):
-    for key in ("published_parsed", "updated_parsed"):
-        t = entry.get(key)
-        if t:
-            try:
-                return datetime(*t[:6])
-            except Exception:
-                pass
-    return None
-
-
-def matches_keywords(title, summary, keywords):
-    blob = f"{title} {summary}".lower()
-    return any(kw.lower() in blob for kw in keywords)
+def compile_rules(cfg):
+    """filter_rules + 关键词（产品/行业任一命中计数）编译成一个执行计划，见 filter_rules。"""
+    rules = {
+        "require_recency_days": DEFAULT_RECENCY_DAYS,
+        "dedup_by": "url",
+        **cfg.get("filter_rules", {}),
+        "require_keywords": cfg["keywords_product"] + cfg["keywords_industry"],
+    }
+    return RulePlan(rules)
 
 
 def main():
@@ -53,73 +47,62 @@ def main():
     all_items = []
     stats = {}
 
+    # 只抓本聚合器的源；与 fetch_news 共用的源在 ingest 快照新鲜期内直接复用；并发 + 单源/整体硬截止见 feed_engine
+    snapshot = ingest(aggregator_cfg=cfg, consumer="aggregator")
+    by_feed = group_by_feed(snapshot["articles"])
+    plan = compile_rules(cfg)
+
     for feed in cfg["feeds"]:
         name = feed["name"]
         url = feed["url"]
-        print(f"→ {name} ({url})")
-        try:
-            parsed = feedparser.parse(url, agent="Mozilla/5.0 RSS Aggregator")
-            if parsed.bozo and not parsed.entries:
-                stats[name] = {"status": "fail", "error": str(parsed.bozo_exception)}
-                continue
-        except Exception as e:
-            stats[name] = {"status": "fail", "error": str(e)}
+        stat = snapshot["feeds"].get(url, {"status": "fail", "error": "not fetched", "elapsed": 0})
+        print(f"→ {name} ({url}): {stat['status']} {stat['elapsed']}s")
+        # 本次单源截止时间和历史延迟（见 feed_health）
+        timing = {key: stat[key] for key in ("deadline", "p50", "p95") if key in stat}
+        if stat["status"] != "ok":
+            stats[name] = {"status": stat["status"], "error": stat["error"], "elapsed": stat["elapsed"], **timing}
             continue
 
         matched = 0
-        for entry in parsed.entries:
-            title = entry.get("title", "").strip()
-            link = entry.get("link", "").strip()
-            summary = re.sub(r"<[^>]+>", "", entry.get("summary", "")).strip()[:800]
-            if not title or not link:
-                continue
-
-            # 时效过滤
-            pub = entry_pub_time(entry)
-            if pub and pub < CUTOFF:
+        for record in by_feed.get(url, []):
+            if not record["title"] or not record["url"]:
                 continue
 
-            # 关键词过滤
-            keywords = cfg["keywords_product"] + cfg["keywords_industry"]
-            if not matches_keywords(title, summary, keywords):
+            # 时效 / 标题排除 / 关键词 / URL 去重（便宜的规则先跑）
+            if plan.check(record) is None:
                 continue
 
             all_items.append({
                 "feed_name": name,
                 "feed_category": feed.get("category", ""),
                 "feed_weight": feed.get("weight", 1),
-                "title": title,
-                "summary": summary[:500],
-                "url": link,
-                "published": pub.isoformat() if pub else None,
+                "title": record["title"],
+                "summary": record["description"][:500],
+                "url": record["url"],
+                "published": record["published"] or None,
             })
             matched += 1
 
-        stats[name] = {"status": "ok", "total": len(parsed.entries), "matched": matched}
-
-    # 按 URL 去重
-    seen = set()
-    dedup = []
-    for it in all_items:
-        if it["url"] not in seen:
-            seen.add(it["url"])
-            dedup.append(it)
+        # recent: 解析时已按 fetch.max_entry_age_days 去掉旧条目后的条数
+        stats[name] = {"status": "ok", "elapsed": stat["elapsed"], "recent": stat["total"], "matched": matched,
+                       **timing}
 
-    # 按发布时间倒序
-    dedup.sort(key=lambda x: x["published"] or "", reverse=True)
+    # 按发布时间倒序（去重已在规则中完成）
+    all_items.sort(key=lambda x: x["published"] or "", reverse=True)
 
     output = {
         "date": TODAY,
         "generated_at": NOW.isoformat(),
-        "item_count": len(dedup),
+        "item_count": len(all_items),
         "feed_stats": stats,
-        "items": dedup,
+        "items": all_items,
     }
 
     with open(OUT_FILE, "w", encoding="utf-8") as f:
         json.dump(output, f, ensure_ascii=False, indent=2)
 
-    print(f"\n✅ Wrote {OUT_FILE} ({len(dedup)} items)")
+    print(f"\n✅ Wrote {OUT_FILE} ({len(all_items)} items)")
+    print(f"Filtered out: {plan.summary() or 'none'}")
     print(f"Feed stats: {json.dumps(stats, ensure_ascii=False, indent=2)}")
 
 
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Declarative article filter rules, compiled into one evaluation plan.
+
+Used for ``filter_rules`` in config/rss-feeds.json (fetch_rss) and for
+``filters`` in settings.json (apply_filters); either block may use any of:
+
+    require_recency_days       drop articles published earlier than this
+    exclude_if_title_contains  drop if the title contains any of these
+    blacklist_sources          drop if the source name contains any of these
+    blacklist_keywords         drop if title or description contains any of these
+    require_keywords           keep only articles matching at least
+    require_keyword_count_min  this many distinct keywords (default 1)
+    whitelist_keywords         keep, and mark as boosted
+    whitelist_sources          (apply() moves boosted articles to the front; the ranker scores the flag)
+    dedup_by                   "url" (canonical, see url_canon) or "title"
+
+Rules run cheapest first (timestamp compare, title only, source name,
+then one matcher pass over title + description, then dedup), and an
+article stops at the first rule that drops it.
+
+Plans run on ingest records, after parsing.  Only the age floor
+(fetch.max_entry_age_days) runs before HTML stripping (see
+feed_engine.parse_feed_body): parsed entries are cached and shared by
+both consumers, whose title rules differ.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from keyword_matcher import get_matcher
+from tokenizer import normalize_title
+from url_canon import DedupIndex
+
+BOOST_LABELS = ("whitelist_keywords", "whitelist_sources")
+# Labels whose matches are content keywords (counted by the ranker)
+KEYWORD_LABELS = ("whitelist_keywords", "require_keywords")
+
+
+class RulePlan:
+    """Compiled rules; ``check`` is stateful only for dedup (one plan per run)."""
+
+    def __init__(self, rules: dict = None, now: datetime = None):
+        rules = rules or {}
+        days = rules.get("require_recency_days")
+        now = now or datetime.utcnow()
+        self.cutoff = (now - timedelta(days=float(days))).isoformat() if days else ""
+        self.title_matcher = get_matcher({"exclude_if_title_contains": rules.get("exclude_if_title_contains", [])})
+        self.source_matcher = get_matcher({
+            "blacklist_sources": rules.get("blacklist_sources", []),
+            "whitelist_sources": rules.get("whitelist_sources", []),
+        })
+        self.text_matcher = get_matcher({
+            "blacklist_keywords": rules.get("blacklist_keywords", []),
+            "whitelist_keywords": rules.get("whitelist_keywords", []),
+            "require_keywords": rules.get("require_keywords", []),
+        })
+        self.require_keywords = bool(rules.get("require_keywords"))
+        self.keyword_count_min = int(rules.get("require_keyword_count_min", 1))
+        self.dedup_by = rules.get("dedup_by", "")
+        self._seen = DedupIndex() if self.dedup_by == "url" else set()
+        self.rejected = Counter()  # rule -> articles dropped by it
+
+    def __bool__(self) -> bool:
+        return bool(self.cutoff or self.title_matcher or self.source_matcher or self.text_matcher or self.dedup_by)
+
+    def _reject(self, rule: str):
+        self.rejected[rule] += 1
+        return None
+
+    def check(self, article: dict):
+        """Matched rule labels ({label: keywords}) if the article is kept, else None."""
+        published = article.get("published") or ""
+        if self.cutoff and published and published < self.cutoff:
+            return self._reject("require_recency_days")
+
+        title = article.get("title", "") or ""
+        if self.title_matcher and self.title_matcher.keywords(title):
+            return self._reject("exclude_if_title_contains")
+
+        matched = self.source_matcher.match(article.get("source", "") or "")
+        if "blacklist_sources" in matched:
+            return self._reject("blacklist_sources")
+
+        if self.text_matcher:
+            matched.update(self.text_matcher.match(title + " " + (article.get("description", "") or "")))
+            if "blacklist_keywords" in matched:
+                return self._reject("blacklist_keywords")
+            if self.require_keywords and len(matched.get("require_keywords", ())) < self.keyword_count_min:
+                return self._reject("require_keyword_count_min")
+
+        if self.dedup_by == "url":
+            if not self._seen.add(article.get("url", "")):
+                return self._reject("dedup_by")
+        elif self.dedup_by == "title":
+            key = normalize_title(title)
+            if key in self._seen:
+                return self._reject("dedup_by")
+            self._seen.add(key)
+
+        return matched
+
+    def apply(self, articles: list[dict]) -> list[dict]:
+        """Kept articles, whitelisted first.
+
+        Each gets ``matched_rules`` (sorted labels), ``matched_keywords``
+        (sorted whitelist / required keywords found in title or description)
+        and ``boosted`` (matched a whitelist).
+        """
+        boosted = []
+        normal = []
+        for article in articles:
+            matched = self.check(article)
+            if matched is None:
+                continue
+            article["matched_rules"] = sorted(matched)
+            article["matched_keywords"] = sorted(set().union(*(matched.get(label, ()) for label in KEYWORD_LABELS)))
+            article["boosted"] = any(label in matched for label in BOOST_LABELS)
+            if article["boosted"]:
+                boosted.append(article)
+            else:
+                normal.append(article)
+        return boosted + normal
+
+    def summary(self) -> str:
+        return ", ".join(f"{rule} {count}" for rule, count in self.rejected.most_common())
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP session for RSS fetches.
+
+One ``requests.Session`` per process with keep-alive connection pools per
+host, so feeds that share a host (rsshub.app routes, WeWe RSS proxies)
+reuse TCP+TLS connections instead of re-handshaking on every request.
+urllib3's connection pools are thread-safe, so the session is shared by
+all fetch threads.
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "Mozilla/5.0"
+
+# Keep-alive connections kept open per host (settings.json fetch.pool_size)
+DEFAULT_POOL_SIZE = 10
+# Number of distinct hosts whose pools are kept
+MAX_HOST_POOLS = 64
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_pool_size(options: dict = None) -> int:
+    """Per-host pool size: fetch options, then HTTP_POOL_SIZE env var, then default."""
+    if options and options.get("pool_size"):
+        return int(options["pool_size"])
+    return int(os.environ.get("HTTP_POOL_SIZE", DEFAULT_POOL_SIZE))
+
+
+def get_session(pool_size: int = None) -> requests.Session:
+    """Return the process-wide pooled session, creating it on first use.
+
+    pool_size only takes effect on the first call.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            size = pool_size or get_pool_size()
+            adapter = HTTPAdapter(pool_connections=MAX_HOST_POOLS, pool_maxsize=size, pool_block=False)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
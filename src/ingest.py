@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Unified RSS ingestion shared by the digest pipeline and the aggregator.
+
+Feeds come from settings.json["rss_feeds"] (the digest) and
+config/rss-feeds.json["feeds"] (the aggregator); a feed listed in both is
+one source.  Every entry is normalized into the same article record and
+each fetched feed is kept in a snapshot in config/cache.  A consumer only
+downloads the feeds it needs that the snapshot doesn't hold fresh, so
+feeds shared by the two consumers are fetched once per cycle.
+
+``fetch_news.fetch_raw_news`` and ``fetch_rss.main`` are views over the
+snapshot: each picks its own feeds, time window and filters.  New entries
+are also appended to the persistent article store (see article_store),
+which ``poll`` keeps filled between digest runs.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+from article_store import ArticleStore
+from cache_files import CACHE_DIR, save_json
+from feed_cache import FeedCache
+from feed_engine import fetch_feeds, get_fetch_options
+from feed_health import FeedHealth
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SETTINGS_PATH = os.path.join(ROOT, "config", "settings.json")
+AGGREGATOR_CONFIG = os.path.join(ROOT, "config", "rss-feeds.json")
+SNAPSHOT_PATH = os.path.join(CACHE_DIR, "ingest_snapshot.json")
+
+# Feeds in this group are fetched first (focused mode depends on them)
+PRIORITY_GROUP = "智能硬件"
+
+
+def _load_json(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def load_aggregator_config() -> dict:
+    """Load config/rss-feeds.json (empty dict if missing)."""
+    return _load_json(AGGREGATOR_CONFIG)
+
+
+def get_feed_sources(settings: dict, aggregator_cfg: dict, digest_urls: list[str] = None) -> list[dict]:
+    """Union of digest and aggregator feeds, one descriptor per URL.
+
+    digest_urls overrides the enabled settings feeds (e.g. the built-in
+    defaults when settings.json has no rss_feeds).
+    """
+    sources = {}
+    digest_feeds = {f.get("url", ""): f for f in settings.get("rss_feeds", []) if f.get("enabled", True)}
+    if digest_urls is None:
+        digest_urls = list(digest_feeds)
+    for url in digest_urls:
+        feed = digest_feeds.get(url, {})
+        sources[url] = {
+            "url": url,
+            "name": feed.get("name", ""),
+            "group": feed.get("group", ""),
+            "category": "",
+            "weight": feed.get("weight", 1),
+            "digest": True,
+            "aggregator": False,
+        }
+    for feed in aggregator_cfg.get("feeds", []):
+        url = feed.get("url", "")
+        source = sources.setdefault(url, {"url": url, "name": "", "group": "", "weight": 1, "digest": False})
+        source["aggregator"] = True
+        source["category"] = feed.get("category", "")
+        source["weight"] = max(source["weight"], feed.get("weight", 1))
+        source["name"] = source["name"] or feed.get("name", "")
+    return [s for s in sources.values() if s["url"]]
+
+
+def fetch_priority(source: dict, health: FeedHealth) -> tuple:
+    """Sort key: priority group first, then higher weight, then higher historical yield."""
+    return (source["group"] != PRIORITY_GROUP, -source["weight"], -health.entry_yield(source["url"]))
+
+
+def _load_snapshot(max_age: float) -> dict:
+    """Fresh part of the saved snapshot: feeds fetched within max_age seconds
+    (run-deadline cut-offs excluded) and their articles."""
+    snapshot = _load_json(SNAPSHOT_PATH)
+    feeds = {}
+    if max_age > 0:
+        now = datetime.now()
+        for url, stat in snapshot.get("feeds", {}).items():
+            fetched_at = stat.get("fetched_at") or snapshot.get("fetched_at")
+            if stat["status"] != "cutoff" and fetched_at and \
+                    (now - datetime.fromisoformat(fetched_at)).total_seconds() <= max_age:
+                feeds[url] = stat
+    articles = [a for a in snapshot.get("articles", []) if a["feed_url"] in feeds]
+    return {"feeds": feeds, "articles": articles}
+
+
+def _save_snapshot(snapshot: dict):
+    save_json(SNAPSHOT_PATH, snapshot, "ingest snapshot")
+
+
+def ingest(settings: dict = None, aggregator_cfg: dict = None, digest_urls: list[str] = None, fresh: bool = False,
+           run_deadline: float = None, consumer: str = None) -> dict:
+    """Fetch the feeds one consumer needs ("digest", "aggregator"; None: the union).
+
+    Feeds the snapshot holds from the last fetch.snapshot_max_age seconds
+    are reused unless fresh is set.  The rest are fetched in
+    ``fetch_priority`` order within a time budget (``run_deadline`` seconds,
+    default fetch.run_deadline); feeds still running when it expires are
+    reported as "cutoff".
+
+    Returns ``{"fetched_at", "feeds": {url: stat}, "articles": [...], "new_articles", "cache"}``
+    where stat is ``{"status": "ok"|"timeout"|"cutoff"|"fail"|"skipped", "error", "elapsed", "total",
+    "fetched_at"}`` plus the deadline used and the feed's health summary (see feed_health);
+    total counts the entries within fetch.max_entry_age_days,
+    and articles are normalized records (no time filtering applied):
+    title, description (plain text), source, url, published (naive UTC ISO or ""),
+    feed_url, feed_name, feed_group, feed_category, feed_weight.
+    """
+    if settings is None:
+        settings = _load_json(os.environ.get("SETTINGS_PATH", SETTINGS_PATH))
+    if aggregator_cfg is None:
+        aggregator_cfg = load_aggregator_config()
+
+    all_sources = get_feed_sources(settings, aggregator_cfg, digest_urls)
+    sources = [s for s in all_sources if consumer is None or s[consumer]]
+    urls = [s["url"] for s in sources]
+    options = get_fetch_options(settings)
+
+    previous = _load_snapshot(0 if fresh else options["snapshot_max_age"])
+    reused = [url for url in urls if url in previous["feeds"]]
+    if len(reused) == len(urls):
+        print(f"  - Ingest: reusing snapshot ({len(urls)} feeds)")
+        return {
+            "fetched_at": min((previous["feeds"][url]["fetched_at"] for url in urls), default=datetime.now().isoformat()),
+            "feeds": {url: previous["feeds"][url] for url in urls},
+            "articles": [a for a in previous["articles"] if a["feed_url"] in set(urls)],
+            "new_articles": 0,
+            "cache": "快照复用",
+        }
+
+    start = time.time()
+    fetched_at = datetime.now().isoformat()
+    cache = FeedCache()
+    health = FeedHealth()
+
+    # Circuit breaker: skip feeds that keep failing, probing them once in a while
+    feeds = {}
+    fetch_urls = []
+    probes = 0
+    for source in sorted(sources, key=lambda s: fetch_priority(s, health)):
+        url = source["url"]
+        if url in previous["feeds"]:
+            continue
+        allowed, reason = health.should_fetch(url, options)
+        if allowed:
+            fetch_urls.append(url)
+            probes += reason == "probe"
+        else:
+            feeds[url] = {"status": "skipped", "error": reason, "elapsed": 0, "total": 0, "fetched_at": fetched_at}
+    deadlines = {url: health.deadline(url, options) for url in fetch_urls}
+
+    results = {r["url"]: r for r in fetch_feeds(fetch_urls, cache=cache, settings=settings, deadlines=deadlines,
+                                                 run_deadline=run_deadline)}
+    cache.save()
+
+    articles = []
+    for source in sources:
+        result = results.get(source["url"])
+        if result is None:
+            continue
+        error = result["error"]
+        status = "ok" if not error else (error if error in ("timeout", "cutoff") else "fail")
+        # A run-deadline cut-off says nothing about the feed itself
+        if status != "cutoff":
+            health.record(source["url"], status == "ok", result["elapsed"], error or "", len(result["articles"]),
+                          result["not_modified"])
+        feeds[source["url"]] = {
+            "status": status,
+            "error": result["error"] or "",
+            "elapsed": round(result["elapsed"], 1),
+            "total": len(result["articles"]),
+            "deadline": round(deadlines[source["url"]], 1),
+            "fetched_at": fetched_at,
+            **health.summary(source["url"]),
+        }
+        for article in result["articles"]:
+            article.update({
+                "feed_name": source["name"],
+                "feed_group": source["group"],
+                "feed_category": source["category"],
+                "feed_weight": source["weight"],
+            })
+            articles.append(article)
+
+    # Keep other feeds' fresh entries in the saved snapshot for the next consumer
+    _save_snapshot({
+        "fetched_at": fetched_at,
+        "feeds": {**previous["feeds"], **feeds},
+        "articles": [a for a in previous["articles"] if a["feed_url"] not in feeds] + articles,
+    })
+    health.save(keep_urls=[s["url"] for s in all_sources])
+    with ArticleStore() as store:
+        new_articles = store.add(articles)
+        store.prune(options["store_retention_days"])
+        # A full digest pass counts as a poll: later runs within poll_max_age only top up the store
+        if consumer != "aggregator" and not any(stat["status"] == "cutoff" for stat in feeds.values()):
+            store.record_poll(len(urls), new_articles)
+
+    for url in reused:
+        feeds[url] = previous["feeds"][url]
+    reused_urls = set(reused)
+    articles += [a for a in previous["articles"] if a["feed_url"] in reused_urls]
+    snapshot = {
+        "fetched_at": fetched_at,
+        "feeds": feeds,
+        "articles": articles,
+        "new_articles": new_articles,
+    }
+
+    skipped = len(urls) - len(reused) - len(fetch_urls)
+    cut = [url for url, stat in feeds.items() if stat["status"] == "cutoff"]
+    print(f"  - Ingest: {len(urls)} feeds ({len(reused)} reused from snapshot, {skipped} skipped by circuit breaker, "
+          f"{probes} probes) in {time.time() - start:.1f}s, {len(articles)} entries ({new_articles} new)")
+    if cut:
+        print(f"  - Ingest: time budget reached, {len(cut)} feeds cut off: {[u.split('/')[-1][:25] for u in cut[:10]]}")
+    snapshot["cache"] = cache.summary()
+    return snapshot
+
+
+def poll(settings: dict = None, digest_urls: list[str] = None) -> int:
+    """One incremental poll: fetch every digest feed and append new entries to the article store.
+
+    Returns the number of new entries.
+    """
+    snapshot = ingest(settings, digest_urls=digest_urls, fresh=True, consumer="digest")
+    return snapshot["new_articles"]
+
+
+def group_by_feed(articles: list[dict]) -> dict[str, list[dict]]:
+    """Group snapshot articles by feed_url, preserving feed order."""
+    by_feed = {}
+    for article in articles:
+        by_feed.setdefault(article["feed_url"], []).append(article)
+    return by_feed
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Incremental parser for the streamed JSON answers of the summarization prompts.
+
+The model answers ``{"categories": [{"name", "icon", "news": [...]}]}`` (or
+``{"news": [...]}`` for the focused hardware prompt).  ``feed`` scans each
+streamed chunk once, tracking strings, nesting and the key each container
+was opened under, and returns every ``news`` object completed so far.
+
+After each complete news item (or category) it remembers the offset and the
+brackets still open there.  A response cut off at max_tokens is then closed
+at the last complete item and parsed, which keeps every fully-formed item
+instead of regex repair.  Structure that can't be JSON (no object in the
+first ``MAX_PREAMBLE`` characters, a closing bracket of the wrong kind)
+sets ``error`` so the caller can abort the stream and retry right away.
+
+A bare token that isn't a JSON literal (usually an unescaped quote inside a
+value) only sets ``damaged``: the rest of the response is collected
+unparsed, so ``fetch_news._parse_json_response`` can still repair it.
+"""
+
+import json
+import re
+
+# Characters of prose / markdown fence allowed before the top-level object
+MAX_PREAMBLE = 2000
+
+ITEM_KEY = "news"
+CATEGORY_KEY = "categories"
+
+_LITERAL_RE = re.compile(r"-?\d+(\.\d+)?([eE][+-]?\d+)?|true|false|null")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONStreamParser:
+    """Feed streamed text; collects the buffer and completed news items."""
+
+    def __init__(self):
+        self.text = ""
+        self.items = []
+        self.done = False      # top-level object closed
+        self.damaged = False   # gave up parsing, text still collected
+        self.error = ""        # unrecoverable structure: abort and retry
+        self._pos = 0
+        self._start = -1
+        self._stack = []       # [closer, key, start offset] per open container
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = None
+        self._key = None
+        self._bare_start = -1
+        self._safe_end = -1
+        self._safe_closers = ""
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Append a chunk; returns the news items completed by it."""
+        self.text += chunk
+        if self.done or self.damaged or self.error:
+            return []
+        new_items = []
+        text = self.text
+        i = self._pos
+        while i < len(text):
+            c = text[i]
+            if self._start < 0:
+                if c == "{":
+                    self._start = i
+                    self._stack.append(["}", None, i])
+                elif i >= MAX_PREAMBLE:
+                    self.error = f"no JSON object in the first {MAX_PREAMBLE} characters"
+                    break
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+            elif c in ' \t\r\n{}[]:,"':
+                if self._bare_start >= 0:
+                    if not _LITERAL_RE.fullmatch(text[self._bare_start:i]):
+                        self.damaged = True
+                        break
+                    self._bare_start = -1
+                if c == '"':
+                    self._in_string = True
+                    self._string_start = i
+                elif c == ":":
+                    self._key = self._last_string
+                elif c == ",":
+                    self._key = None
+                elif c in "{[":
+                    self._stack.append([_CLOSERS[c], self._key, i])
+                    self._key = None
+                elif c in "}]":
+                    if self._stack[-1][0] != c:
+                        self.error = f"unexpected '{c}' at offset {i}"
+                        break
+                    closer, key, start = self._stack.pop()
+                    if not self._stack:
+                        self.done = True
+                        i += 1
+                        break
+                    parent_closer, parent_key = self._stack[-1][0], self._stack[-1][1]
+                    if closer == "}" and parent_closer == "]" and parent_key in (ITEM_KEY, CATEGORY_KEY):
+                        if parent_key == ITEM_KEY:
+                            try:
+                                new_items.append(json.loads(text[start:i + 1]))
+                            except json.JSONDecodeError:
+                                self.damaged = True
+                                break
+                        self._safe_end = i + 1
+                        self._safe_closers = "".join(entry[0] for entry in reversed(self._stack))
+            elif self._bare_start < 0:
+                self._bare_start = i
+            i += 1
+        self._pos = i
+        self.items.extend(new_items)
+        return new_items
+
+    def result(self):
+        """The parsed object: complete, or salvaged up to the last complete item; None otherwise."""
+        if self._start < 0 or self.error:
+            return None
+        if self.done:
+            try:
+                return json.loads(self.text[self._start:self._pos])
+            except json.JSONDecodeError:
+                return None
+        if self.damaged or self._safe_end < 0:
+            return None
+        try:
+            return json.loads(self.text[self._start:self._safe_end] + self._safe_closers)
+        except json.JSONDecodeError:
+            return None
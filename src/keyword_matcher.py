@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Compiled keyword matcher shared by apply_filters and the RSS aggregator.
+
+All keywords of all rules go into one alternation, longest first, inside
+a lookahead, so a single ``finditer`` over the lower-cased text finds the
+longest keyword starting at each position.  Any shorter keyword starting
+there is a substring of that match; those are precomputed per keyword,
+so the result is exactly the set of keywords contained in the text
+(plain ``kw in text`` semantics) no matter how many keywords there are.
+
+Matchers are cached per keyword configuration, so one settings load
+compiles each rule set once.
+"""
+
+import re
+from functools import lru_cache
+
+
+class KeywordMatcher:
+    """Case-insensitive substring matcher for named keyword rules."""
+
+    def __init__(self, rules: dict):
+        self._labels = {}  # keyword -> labels of the rules containing it
+        for label, keywords in rules.items():
+            for kw in keywords:
+                kw = kw.lower()
+                if kw:
+                    self._labels.setdefault(kw, set()).add(label)
+        keywords = sorted(self._labels, key=lambda k: (-len(k), k))
+        self._implied = {kw: [k for k in keywords if k in kw] for kw in keywords}
+        self._regex = re.compile("(?=(" + "|".join(map(re.escape, keywords)) + "))") if keywords else None
+
+    def __bool__(self) -> bool:
+        return self._regex is not None
+
+    def keywords(self, text: str) -> set:
+        """Every keyword contained in the text."""
+        found = set()
+        if self._regex is None or not text:
+            return found
+        for m in self._regex.finditer(text.lower()):
+            kw = m.group(1)
+            if kw not in found:
+                found.update(self._implied[kw])
+        return found
+
+    def match(self, text: str) -> dict:
+        """Keywords found in the text, grouped by rule label (rules without hits omitted)."""
+        matched = {}
+        for kw in self.keywords(text):
+            for label in self._labels[kw]:
+                matched.setdefault(label, set()).add(kw)
+        return matched
+
+
+@lru_cache(maxsize=32)
+def _compile(rules: tuple) -> KeywordMatcher:
+    return KeywordMatcher({label: keywords for label, keywords in rules})
+
+
+def get_matcher(rules: dict) -> KeywordMatcher:
+    """Cached matcher for a {label: [keywords]} mapping."""
+    return _compile(tuple((label, tuple(keywords)) for label, keywords in sorted(rules.items())))
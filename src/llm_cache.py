@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of LLM responses.
+
+Retries, manual re-fetches and stale-draft regenerations often send the
+exact same prompt again.  Responses are stored under a hash of
+(backend, model, prompt), but only once they have parsed as JSON (see
+``fetch_news._call_ai``).  Entries expire after ``TTL_HOURS``.  When the
+file grows past ``MAX_BYTES``, the oldest entries are dropped.
+
+Set ``LLM_CACHE_BYPASS=1`` (or run ``main.py fetch --fresh-llm``) to
+always ask the model for a fresh sample; fresh responses still refresh
+the cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from cache_files import CACHE_DIR, save_json
+
+LLM_CACHE_PATH = os.path.join(CACHE_DIR, "llm_cache.json")
+
+TTL_HOURS = 24
+MAX_BYTES = 4 * 1024 * 1024
+
+
+def cache_key(backend: str, model: str, prompt: str) -> str:
+    return hashlib.sha256(json.dumps([backend, model, prompt], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def is_bypassed() -> bool:
+    return os.environ.get("LLM_CACHE_BYPASS", "") not in ("", "0")
+
+
+class LLMCache:
+    """Response cache on disk, safe to share between threads."""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get("LLM_CACHE_PATH", LLM_CACHE_PATH)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f).get("entries", {})
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            self._entries = {}
+
+    def get(self, backend: str, model: str, prompt: str):
+        """Cached response text, or None if missing or expired."""
+        expired_before = (datetime.now() - timedelta(hours=TTL_HOURS)).isoformat()
+        with self._lock:
+            entry = self._entries.get(cache_key(backend, model, prompt))
+        if entry and entry["created_at"] >= expired_before:
+            return entry["response"]
+        return None
+
+    def put(self, backend: str, model: str, prompt: str, response: str):
+        """Store a response (that passed parsing) and write the cache."""
+        with self._lock:
+            self._entries[cache_key(backend, model, prompt)] = {
+                "response": response,
+                "created_at": datetime.now().isoformat(),
+            }
+            self._evict()
+            self._save()
+
+    def _evict(self):
+        """Drop expired entries, then the oldest ones until under MAX_BYTES."""
+        expired_before = (datetime.now() - timedelta(hours=TTL_HOURS)).isoformat()
+        entries = sorted(
+            ((k, e) for k, e in self._entries.items() if e["created_at"] >= expired_before),
+            key=lambda item: item[1]["created_at"], reverse=True,
+        )
+        kept, size = {}, 0
+        for key, entry in entries:
+            size += len(entry["response"].encode("utf-8"))
+            if size > MAX_BYTES and kept:
+                break
+            kept[key] = entry
+        self._entries = kept
+
+    def _save(self):
+        save_json(self.path, {"entries": self._entries}, "LLM cache")
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Process-wide cache instance (loaded on first use)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LLMCache()
+        return _shared
@@ -5,19 +5,22 @@ Supports modes:
   - fetch:     Fetch news, save as draft (for review)
   - send:      Read draft and send (email/webhook by channel type)
   - webhook:   Read draft and send webhook only (no email, no status change)
+  - poll:      Fetch feeds and append new entries to the local article store
   - (default): Fetch + send in one step (legacy behavior)
 """
 
 import os
 import sys
 import json
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
 from fetch_news import (
-    fetch_news, format_email_html, save_draft, load_draft, load_settings,
-    summarize_news_with_claude,
+    LLM_MAX_CONCURRENCY, fetch_news, format_email_html, get_cutoff_time, get_fetch_budget, get_rss_feeds,
+    refresh_articles, save_draft, load_draft, load_settings, summarize_news,
 )
+from ingest import poll
 from send_email import send_email
 from send_webhook import send_webhook, send_admin_alert, format_webhook_markdown
 
@@ -221,9 +224,10 @@ def run_fetch(settings: dict, manual: bool = False, channel_ids: list[str] = Non
 
     Steps:
     1. Determine which channels need fetching
-    2. RSS fetch once
-    3. Collect unique topic_modes, call Claude once per mode
-    4. Save per-channel drafts (email draft = YYYY-MM-DD.json)
+    2. RSS fetch once into the article store (union of all channel windows)
+    3. Per (topic_mode, custom prompt, window) job, query its candidate articles
+    4. Summarize all jobs concurrently (bounded, see fetch_news.LLM_MAX_CONCURRENCY)
+    5. Save per-channel drafts from their job's result (email draft = YYYY-MM-DD.json)
     """
     anthropic_key = os.environ.get("ANTHROPIC_API_KEY", "")
     deepseek_key = os.environ.get("DEEPSEEK_API_KEY", "")
@@ -249,55 +253,68 @@ def run_fetch(settings: dict, manual: bool = False, channel_ids: list[str] = Non
 
     topic = settings.get("news_topic", "AI")
 
-    # Collect all needed topic_modes and compute max_items per mode
-    all_modes = set()
-    max_items_by_mode = {}
+    # One summarization job per (topic_mode, custom prompt, window); channels
+    # sharing a job share its result
+    cutoffs = {ch.get("id", "unknown"): get_cutoff_time(settings, manual=manual, channel=ch) for ch in channels}
+    jobs = {}
+    channel_jobs = {}
     for ch in channels:
+        ch_id = ch.get("id", "unknown")
         mode = ch.get("topic_mode", "broad")
-        all_modes.add(mode)
-        ch_max = ch.get("max_news_items", 10)
-        max_items_by_mode[mode] = max(max_items_by_mode.get(mode, 0), ch_max)
-
-    # If any mode is focused, enable hardware_unlimited for RSS fetch
-    hardware_unlimited = "focused" in all_modes
-
-    # Use the largest max_news_items across ALL channels for the initial fetch
-    max_items = max(max_items_by_mode.values())
+        custom_prompt = ch.get("custom_prompt", settings.get("custom_prompt", ""))
+        # Manual runs: every window is the last 24h (cutoffs differ only by microseconds)
+        key = (mode, custom_prompt, None if manual else cutoffs[ch_id])
+        job = jobs.setdefault(key, {"channel": ch, "mode": mode, "custom_prompt": custom_prompt, "max_items": 0})
+        job["max_items"] = max(job["max_items"], ch.get("max_news_items", 10))
+        channel_jobs[ch_id] = key
 
     print(f"Fetching news... (manual={manual})")
     print(f"  - Channels to fetch: {[ch.get('name', ch.get('id')) for ch in channels]}")
-    print(f"  - Unique modes needed: {all_modes}")
-
-    # Use the earliest channel as reference for time window and topic_mode
-    ref_channel = channels[0]
-    ref_mode = ref_channel.get("topic_mode", "broad")
-    # Pass topic_mode at top-level so summarize_news_with_claude picks it up
-    ref_settings = {**settings, "topic_mode": ref_mode}
-    news_data = fetch_news(
-        anthropic_key, topic=topic, max_items=max_items,
-        settings=ref_settings, manual=manual, hardware_unlimited=hardware_unlimited,
-        channel=ref_channel,
-    )
-
-    if news_data.get("error"):
-        print(f"Warning: {news_data['error']}")
-
-    raw_articles = news_data.get("_raw_articles", [])
-    categories = news_data.get("categories", [])
-    total_news = sum(len(c.get("news", [])) for c in categories)
-    print(f"Got {total_news} news items in {len(categories)} categories")
+    print(f"  - Unique modes needed: {sorted({job['mode'] for job in jobs.values()})}, summarization jobs: {len(jobs)}")
+
+    # One network pass for all channels: the article store covers the union
+    # window (earliest cutoff to latest send time), and each channel then
+    # queries its own window from it
+    union_start = min(cutoffs.values())
+    union_end = max(cutoffs.values()) + timedelta(days=1)
+    print(f"  - Union window (UTC): {union_start.strftime('%Y-%m-%d %H:%M')} ~ {union_end.strftime('%Y-%m-%d %H:%M')}")
+    budget = min(get_fetch_budget(settings, manual=manual, channel=ch) for ch in channels)
+    print(f"  - Fetch budget: {budget:.0f}s")
+    refresh_articles(settings, fresh=manual, budget=budget)
+
+    # Candidate articles per job (store queries and on-disk indexes, one job at a time)
+    for job in jobs.values():
+        ch = job["channel"]
+        print(f"\n--- Job: {job['mode']} mode{' (custom prompt)' if job['custom_prompt'] else ''}, "
+              f"window of {ch.get('name', ch.get('id'))}, max={job['max_items']} ---")
+        # Pass topic_mode / custom_prompt at top-level so summarize_news_with_claude picks them up
+        job["settings"] = {**settings, "topic_mode": job["mode"], "custom_prompt": job["custom_prompt"]}
+        job["news_data"] = fetch_news(
+            anthropic_key, topic=topic, max_items=job["max_items"], settings=job["settings"],
+            manual=manual, channel=ch, prefetched=True, summarize=False,
+        )
 
-    if categories:
-        for cat in categories:
-            icon = cat.get("icon", "")
-            name = cat.get("name", "")
-            count = len(cat.get("news", []))
-            print(f"   {icon} {name}: {count}")
+    # LLM stage: all jobs concurrently (in-flight requests bounded, see LLM_MAX_CONCURRENCY)
+    pending = [job for job in jobs.values() if not job["news_data"].get("error")]
+    if pending:
+        print(f"\nSummarizing {len(pending)} job(s) concurrently...")
+        with ThreadPoolExecutor(max_workers=min(len(pending), LLM_MAX_CONCURRENCY)) as executor:
+            futures = {
+                executor.submit(summarize_news, anthropic_key, job["news_data"], job["max_items"], job["settings"]): job
+                for job in pending
+            }
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    job["news_data"] = future.result()
+                except Exception as e:
+                    print(f"  Error: {job['mode']} mode summarization failed: {e}")
 
-    # Cache Claude results by topic_mode (ref_mode set above)
-    mode_results = {ref_mode: categories}
+    # First non-empty result per topic_mode, for the MD/HTML exports
+    mode_results = {}
+    channel_categories = {}
 
-    # Process each channel
+    # Assemble each channel's draft from its job's result
     for ch in channels:
         ch_id = ch.get("id", "unknown")
         ch_mode = ch.get("topic_mode", "broad")
@@ -305,40 +322,23 @@ def run_fetch(settings: dict, manual: bool = False, channel_ids: list[str] = Non
         ch_max = ch.get("max_news_items", 10)
         print(f"\n--- Channel: {ch_name} (id={ch_id}, mode={ch_mode}) ---")
 
-        if ch_mode in mode_results:
-            ch_categories = mode_results[ch_mode]
-            original_count = sum(len(c.get('news', [])) for c in ch_categories)
-            print(f"  Reusing {ch_mode} mode result ({original_count} items)")
-            # Truncate to this channel's max_news_items
-            ch_categories = truncate_categories(ch_categories, ch_max, balanced=(ch_mode == "focused"))
-            truncated_count = sum(len(c.get('news', [])) for c in ch_categories)
-            if truncated_count < original_count:
-                print(f"  Truncated to {truncated_count} items (max={ch_max})")
-        else:
-            if not raw_articles:
-                print(f"  No raw articles available, skipping Claude call")
-                ch_categories = []
-            else:
-                # Use the max_items for this mode (across all channels with this mode)
-                mode_max = max_items_by_mode.get(ch_mode, ch_max)
-                print(f"  Calling Claude for {ch_mode} mode (max={mode_max})...")
-                ch_settings = {**settings, "topic_mode": ch_mode}
-                ch_categories = summarize_news_with_claude(
-                    anthropic_key, raw_articles, mode_max, ch_settings,
-                )
-                total = sum(len(c.get("news", [])) for c in ch_categories)
-                print(f"  Got {total} items for {ch_mode} mode")
-            # Only cache non-empty results so other channels can retry on failure
-            if ch_categories:
-                mode_results[ch_mode] = ch_categories
-            else:
-                print(f"  WARNING: {ch_mode} mode returned 0 items, not caching (next channel will retry)")
-            # Truncate for this specific channel
-            original_count = sum(len(c.get("news", [])) for c in ch_categories)
-            ch_categories = truncate_categories(ch_categories, ch_max, balanced=(ch_mode == "focused"))
-            truncated_count = sum(len(c.get("news", [])) for c in ch_categories)
-            if truncated_count < original_count:
-                print(f"  Truncated to {truncated_count} items for this channel (max={ch_max})")
+        news_data = jobs[channel_jobs[ch_id]]["news_data"]
+        if news_data.get("error"):
+            print(f"Warning: {news_data['error']}")
+        categories = news_data.get("categories", [])
+        total_news = sum(len(c.get("news", [])) for c in categories)
+        print(f"  Got {total_news} news items in {len(categories)} categories")
+        for cat in categories:
+            print(f"   {cat.get('icon', '')} {cat.get('name', '')}: {len(cat.get('news', []))}")
+        if categories:
+            mode_results.setdefault(ch_mode, categories)
+
+        # Truncate for this specific channel
+        ch_categories = truncate_categories(categories, ch_max, balanced=(ch_mode == "focused"))
+        truncated_count = sum(len(c.get("news", [])) for c in ch_categories)
+        if truncated_count < total_news:
+            print(f"  Truncated to {truncated_count} items for this channel (max={ch_max})")
+        channel_categories[ch_id] = ch_categories
 
         # Build draft data
         ch_draft = {
@@ -358,7 +358,7 @@ def run_fetch(settings: dict, manual: bool = False, channel_ids: list[str] = Non
     # Export MD + HTML files (one per topic_mode)
     exports_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "exports")
     os.makedirs(exports_dir, exist_ok=True)
-    news_date = news_data.get("date", datetime.now(tz).strftime("%Y-%m-%d"))
+    news_date = datetime.now(tz).strftime("%Y-%m-%d")
     for mode, cats in mode_results.items():
         if not cats:
             continue
@@ -381,9 +381,7 @@ def run_fetch(settings: dict, manual: bool = False, channel_ids: list[str] = Non
         ch_id = ch.get("id", "unknown")
         ch_name = ch.get("name", ch_id)
         ch_mode = ch.get("topic_mode", "broad")
-        ch_cats = mode_results.get(ch_mode, [])
-        ch_max = ch.get("max_news_items", 10)
-        total = sum(len(c.get("news", [])) for c in truncate_categories(ch_cats, ch_max, balanced=(ch_mode == "focused")))
+        total = sum(len(c.get("news", [])) for c in channel_categories.get(ch_id, []))
         if total == 0:
             empty_channels.append(f"- {ch_name} ({ch_mode})")
 
@@ -403,6 +401,22 @@ def run_fetch(settings: dict, manual: bool = False, channel_ids: list[str] = Non
     return 0
 
 
+# ---------------------------------------------------------------------------
+# Mode: poll
+# ---------------------------------------------------------------------------
+
+def run_poll(settings: dict) -> int:
+    """Incremental poll: append new feed entries to the article store.
+
+    Runs on its own schedule through the day so that the digest fetch only
+    queries the store (see fetch_news.fetch_raw_news).
+    """
+    print("Polling RSS feeds...")
+    new_count = poll(settings, digest_urls=get_rss_feeds(settings))
+    print(f"Stored {new_count} new articles")
+    return 0
+
+
 # ---------------------------------------------------------------------------
 # Mode: send
 # ---------------------------------------------------------------------------
@@ -681,6 +695,10 @@ def main():
     # Check for --manual flag
     manual_flag = "--manual" in sys.argv
 
+    # --fresh-llm: skip the LLM response cache (see llm_cache)
+    if "--fresh-llm" in sys.argv:
+        os.environ["LLM_CACHE_BYPASS"] = "1"
+
     # Parse --channel <id> argument
     channel_id = None
     args = sys.argv[2:]
@@ -690,7 +708,7 @@ def main():
         if args[i] == "--channel" and i + 1 < len(args):
             channel_id = args[i + 1]
             i += 2
-        elif args[i] == "--manual":
+        elif args[i] in ("--manual", "--fresh-llm"):
             i += 1
         else:
             if date_arg is None:
@@ -699,6 +717,8 @@ def main():
 
     if mode == "fetch":
         exit_code = run_fetch(settings, manual=manual_flag, channel_ids=[channel_id] if channel_id else None)
+    elif mode == "poll":
+        exit_code = run_poll(settings)
     elif mode == "send":
         exit_code = run_send(settings, date_arg, channel_id=channel_id)
     elif mode == "webhook":
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+MinHash signatures and an LSH banding index for title clustering.
+
+``story_index.StoryIndex`` only computes the exact Jaccard similarity
+against stories that share at least one LSH band with the article,
+instead of against every story.  With 32 bands of 2 rows a pair at the
+0.35 clustering threshold becomes a candidate with probability ~0.985
+(0.998 at 0.45), while unrelated titles rarely collide.
+
+The MinHash of a union is the element-wise minimum of the signatures, so
+a story's signature follows its growing token union without rehashing.
+"""
+
+import random
+import zlib
+
+NUM_PERM = 64
+BAND_ROWS = 2
+
+# Universal hashing (a * x + b) mod p over 32-bit token hashes
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240501)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def minhash(tokens) -> tuple:
+    """MinHash signature of a non-empty token set (stable across runs)."""
+    hashes = [zlib.crc32(token.encode("utf-8")) for token in tokens]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def merge_signatures(sig_a: tuple, sig_b: tuple) -> tuple:
+    """Signature of the union of two token sets."""
+    return tuple(map(min, sig_a, sig_b))
+
+
+class LSHIndex:
+    """Band buckets mapping signature slices to the keys (cluster ids) that produced them."""
+
+    def __init__(self, band_rows: int = BAND_ROWS):
+        self.band_rows = band_rows
+        self._buckets = {}
+
+    def _bands(self, signature: tuple):
+        rows = self.band_rows
+        return [(start, signature[start:start + rows]) for start in range(0, len(signature), rows)]
+
+    def add(self, key, signature: tuple):
+        """Index a key under every band of its signature (re-adding after a merge is fine)."""
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, set()).add(key)
+
+    def candidates(self, signature: tuple) -> set:
+        """Keys sharing at least one band with the signature."""
+        found = set()
+        for band in self._bands(signature):
+            found.update(self._buckets.get(band, ()))
+        return found
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted packing of article blocks into a prompt.
+
+Articles arrive in ranked order (see ranker).  Each block's size is
+estimated in tokens: CJK characters count as one token each, and other
+text as one token per four characters.  The blocks are then fitted into
+the prompt's token budget.  When the full blocks don't fit, descriptions
+are shortened step by step (``DESCRIPTION_STEPS``), lowest-ranked articles
+first.  Articles are dropped from the tail only once every description
+is at the shortest step.
+
+Formatted blocks are cached per article content and description length,
+so the focused hardware / AI prompts and concurrent modes reuse them.
+Budgets are per prompt mode (``DEFAULT_TOKEN_BUDGETS``); settings
+``prompt_token_budget`` overrides them with a number or a {mode: tokens}
+mapping.
+"""
+
+import re
+from functools import lru_cache
+
+# Rough token budgets per prompt mode (article blocks only, not instructions)
+DEFAULT_TOKEN_BUDGETS = {
+    "broad": 20000,
+    "focused_hardware": 9000,
+    "focused_ai_industry": 14000,
+}
+DEFAULT_TOKEN_BUDGET = 20000
+
+# Description lengths tried in turn before articles are dropped
+DESCRIPTION_STEPS = (500, 250, 120, 0)
+
+# Alternate sources listed in a collapsed event block
+MAX_ALTERNATES = 5
+
+_CJK_RE = re.compile(r"[　-ヿ㐀-䶿一-鿿가-힯豈-﫿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def get_token_budget(settings: dict, mode: str) -> int:
+    configured = (settings or {}).get("prompt_token_budget")
+    if isinstance(configured, (int, float)):
+        return int(configured)
+    if isinstance(configured, dict) and mode in configured:
+        return int(configured[mode])
+    return DEFAULT_TOKEN_BUDGETS.get(mode, DEFAULT_TOKEN_BUDGET)
+
+
+@lru_cache(maxsize=4096)
+def _block(title: str, source: str, published: str, coverage_line: str, description: str, url: str) -> tuple:
+    """(formatted block without its "Article N:" header, estimated tokens)."""
+    body = f"""Title: {title}
+Source: {source}
+Published: {published}{coverage_line}
+Description: {description}
+URL: {url}
+"""
+    return body, estimate_tokens(body) + 6  # + separator and header
+
+
+def _blocks(article: dict) -> list[tuple]:
+    """The article's block at every description step."""
+    coverage = article.get('coverage_count', 1)
+    coverage_line = ""
+    if coverage > 1:
+        sources = ", ".join(article.get('coverage_sources', []))
+        coverage_line = f"\nCoverage: {coverage} sources ({sources}) ★"
+    alternates = article.get('alternates', [])[:MAX_ALTERNATES]
+    if alternates:
+        coverage_line += "\nAlso: " + "; ".join(f"{a['source']} {a['url']}" for a in alternates)
+    description = article.get('description', '') or ''
+    fields = (article.get('title', ''), article.get('source', ''), article.get('published', ''), coverage_line)
+    return [_block(*fields, description[:length], article.get('url', '')) for length in DESCRIPTION_STEPS]
+
+
+def pack_articles(articles: list[dict], budget: int = None) -> tuple:
+    """Format ranked articles within a token budget (None: no limit, full descriptions).
+
+    Returns (articles text, packed articles, stats dict).
+    """
+    blocks = [_blocks(a) for a in articles]
+    steps = [0] * len(articles)
+    total = sum(b[0][1] for b in blocks)
+    count = len(articles)
+    if budget is not None:
+        # Shorten descriptions, lowest-ranked first, one step at a time
+        for step in range(1, len(DESCRIPTION_STEPS)):
+            for i in reversed(range(count)):
+                if total <= budget:
+                    break
+                total += blocks[i][step][1] - blocks[i][steps[i]][1]
+                steps[i] = step
+        # Then drop articles from the tail
+        while count and total > budget:
+            count -= 1
+            total -= blocks[count][steps[count]][1]
+
+    text = "".join(f"\n---\nArticle {i}:\n{blocks[i - 1][steps[i - 1]][0]}" for i in range(1, count + 1))
+    stats = {
+        "articles": count,
+        "candidates": len(articles),
+        "tokens": total,
+        "shortened": sum(1 for s in steps[:count] if s),
+    }
+    return text, articles[:count], stats
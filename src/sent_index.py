@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Persistent fingerprints of news that has already been sent.
+
+Every item of a sent draft is recorded by canonical URL hash and by
+normalized-title hash, with every time it was sent (the draft's
+``sent_at`` in the settings timezone; drafts sent before that field
+existed count as sent at the end of their ``date``).  Windows are days in
+the settings timezone, like the draft ``date``.  Before a prompt is built,
+raw articles matching a fingerprint from the look-back window are dropped
+deterministically (``settings["dedup"]["lookback_days"]``, default three
+weeks) instead of asking the LLM to avoid a list of recent titles.
+
+``save_draft`` records a draft the moment its status becomes "sent".
+Send jobs run on separate runners, so ``sync`` also indexes sent drafts
+committed by them; each draft file is only parsed until it is final.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from cache_files import CACHE_DIR, save_json
+from tokenizer import normalize_title
+from url_canon import url_key
+
+SENT_INDEX_PATH = os.path.join(CACHE_DIR, "sent_index.json")
+DRAFTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "drafts")
+
+DEFAULT_LOOKBACK_DAYS = 21
+# Unsent drafts older than this are not re-read (they won't be sent any more)
+PENDING_DAYS = 2
+
+
+def title_key(title: str) -> str:
+    """Short hash of a normalized title ("" for an empty title)."""
+    normalized = normalize_title(title)
+    if not normalized:
+        return ""
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def get_lookback_days(settings: dict = None) -> int:
+    return int((settings or {}).get("dedup", {}).get("lookback_days", DEFAULT_LOOKBACK_DAYS))
+
+
+def _in_window(times: list[str], since: str, until: str) -> list[str]:
+    """Send times whose day is in [since, until) (YYYY-MM-DD)."""
+    return [t for t in times if since <= t[:10] < until]
+
+
+class SentIndex:
+    """URL / title fingerprints of sent news, keyed to the times they were sent."""
+
+    def __init__(self, path: str = None, tz_name: str = "Asia/Shanghai"):
+        self.path = path or os.environ.get("SENT_INDEX_PATH", SENT_INDEX_PATH)
+        self.tz = ZoneInfo(tz_name)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        # url hash -> [send times]; title hash -> [[send times], title]
+        # (older files kept one date, or dates)
+        self._urls = {k: self._times(v) for k, v in data.get("urls", {}).items()}
+        self._titles = {k: [self._times(v[0]), v[1]] for k, v in data.get("titles", {}).items()}
+        self._drafts = data.get("drafts", {})    # draft filename -> "sent" | "final"
+
+    def _day(self, days_ago: int = 0) -> str:
+        """Date (YYYY-MM-DD) in the settings timezone, days_ago days back."""
+        return (datetime.now(self.tz) - timedelta(days=days_ago)).strftime("%Y-%m-%d")
+
+    def _end_of_day(self, date: str) -> str:
+        return datetime.fromisoformat(date + "T23:59:59").replace(tzinfo=self.tz).isoformat()
+
+    def _times(self, value) -> list[str]:
+        """Send times from a stored value (a time, a date or a list of either)."""
+        values = [value] if isinstance(value, str) else value
+        return [self._end_of_day(v) if len(v) == 10 else v for v in values]
+
+    def add_draft(self, draft: dict, filename: str = None):
+        """Record every news item of a sent draft."""
+        sent_at = draft.get("sent_at") or self._end_of_day(draft.get("date", self._day()))
+        for cat in draft.get("categories", []):
+            for news in cat.get("news", []):
+                key = url_key(news.get("url", ""))
+                if key:
+                    self._urls[key] = sorted(set(self._urls.get(key, [])) | {sent_at})
+                title = news.get("title", "").strip()
+                key = title_key(title)
+                if key:
+                    self._titles[key] = [sorted(set(self._titles.get(key, [[]])[0]) | {sent_at}), title]
+        if filename:
+            self._drafts[filename] = "sent"
+
+    def sync(self, drafts_dir: str = DRAFTS_DIR, lookback_days: int = DEFAULT_LOOKBACK_DAYS):
+        """Index sent drafts written by other runs; returns how many drafts were read."""
+        since = self._day(lookback_days)
+        pending_since = self._day(PENDING_DAYS)
+        try:
+            filenames = os.listdir(drafts_dir)
+        except OSError:
+            return 0
+        read = 0
+        for filename in filenames:
+            if not filename.endswith(".json") or filename in self._drafts or filename[:10] < since:
+                continue
+            try:
+                with open(os.path.join(drafts_dir, filename), "r", encoding="utf-8") as f:
+                    draft = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                continue
+            read += 1
+            if draft.get("status") == "sent":
+                self.add_draft(draft, filename)
+            elif filename[:10] < pending_since:
+                self._drafts[filename] = "final"
+        return read
+
+    def is_sent(self, article: dict, since: str, until: str) -> bool:
+        """Whether an article's URL or title was sent in [since, until) (YYYY-MM-DD)."""
+        key = url_key(article.get("url", ""))
+        if key and _in_window(self._urls.get(key, []), since, until):
+            return True
+        key = title_key(article.get("title", ""))
+        return bool(key) and bool(_in_window(self._titles.get(key, [[]])[0], since, until))
+
+    def last_sent(self, url_keys, since: str, until: str) -> str:
+        """Latest time, on a day in [since, until), one of these URL hashes was sent ("" if none)."""
+        return max((d for key in url_keys for d in _in_window(self._urls.get(key, []), since, until)), default="")
+
+    def filter(self, articles: list[dict], lookback_days: int = DEFAULT_LOOKBACK_DAYS) -> tuple[list[dict], int]:
+        """Drop articles sent on an earlier day of the look-back window; returns (kept, dropped count).
+
+        Today's sends don't count: channels sending later today have their own audience.
+        """
+        kept = [a for a in articles if not self.is_sent(a, self._day(lookback_days), self._day())]
+        return kept, len(articles) - len(kept)
+
+    def recent_titles(self, days: int = 2) -> list[str]:
+        """Titles sent in the last ``days`` days (excluding today)."""
+        since, today = self._day(days), self._day()
+        return sorted(title for times, title in self._titles.values() if _in_window(times, since, today))
+
+    def save(self, lookback_days: int = DEFAULT_LOOKBACK_DAYS):
+        """Write the index, dropping fingerprints and drafts older than the look-back window."""
+        since = self._day(lookback_days)
+        urls = {k: [t for t in times if t[:10] >= since] for k, times in self._urls.items()}
+        titles = {k: [[t for t in times if t[:10] >= since], title] for k, (times, title) in self._titles.items()}
+        data = {
+            "urls": {k: times for k, times in urls.items() if times},
+            "titles": {k: v for k, v in titles.items() if v[0]},
+            "drafts": {f: s for f, s in self._drafts.items() if f[:10] >= since},
+        }
+        save_json(self.path, data, "sent index")
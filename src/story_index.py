@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Persistent story clusters across runs and days.
+
+Each article is assigned once, by canonical URL hash, either to the most
+similar existing story (Jaccard of title tokens against the story's token
+union, candidates from the MinHash/LSH index) or to a new story.  Stories
+keep their sources, coverage count and first/last-seen times in
+config/cache/story_index.json, so a story that develops over several days
+keeps its ID and later runs only tokenize and compare new articles.
+Timestamps are in the settings timezone, like sent_index's send times.
+
+A story counts as already sent when one of its articles was in a sent
+draft (see sent_index); it is offered again only after it picks up
+articles first seen after that send.  Stories not seen for
+``STORY_RETENTION_DAYS`` are dropped.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from cache_files import CACHE_DIR, save_json
+from minhash_index import LSHIndex, merge_signatures, minhash
+from tokenizer import normalize_title, title_tokens
+from url_canon import url_key
+
+STORY_INDEX_PATH = os.path.join(CACHE_DIR, "story_index.json")
+
+STORY_THRESHOLD = 0.35
+STORY_RETENTION_DAYS = 7
+
+
+def jaccard(tokens_a: set, tokens_b: set) -> float:
+    """Jaccard similarity between two token sets."""
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+def article_key(article: dict) -> str:
+    """Canonical URL hash, or the normalized title for articles without a link."""
+    return url_key(article.get("url", "")) or "title:" + normalize_title(article.get("title", ""))
+
+
+def _parse_time(value: str, tz) -> datetime:
+    """Aware datetime of a stored timestamp (naive ones, from older files, are local time)."""
+    return datetime.fromisoformat(value).astimezone(tz)
+
+
+class StoryIndex:
+    """Story clusters with incremental assignment (in memory only if ``persist`` is False)."""
+
+    def __init__(self, path: str = None, threshold: float = STORY_THRESHOLD, persist: bool = True,
+                 tz_name: str = "Asia/Shanghai"):
+        self.path = path or os.environ.get("STORY_INDEX_PATH", STORY_INDEX_PATH)
+        self.tz = ZoneInfo(tz_name)
+        self.threshold = threshold
+        self.persist = persist
+        data = {}
+        if persist:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                data = {}
+        self._next_id = data.get("next_id", 1)
+        self._stories = {}   # story id -> story dict
+        self._tokens = {}    # story id -> token union (frozenset)
+        self._sigs = {}      # story id -> MinHash signature of the union
+        self._articles = {}  # article key -> story id
+        self._lsh = LSHIndex()
+        for sid, story in data.get("stories", {}).items():
+            sid = int(sid)
+            tokens = frozenset(story.pop("tokens", []))
+            sig = tuple(story.pop("sig", ())) or None
+            self._stories[sid] = story
+            self._tokens[sid] = tokens
+            self._sigs[sid] = sig
+            if sig:
+                self._lsh.add(sid, sig)
+            for key in story["articles"]:
+                self._articles[key] = sid
+
+    def _now(self) -> str:
+        return datetime.now(self.tz).isoformat(timespec="seconds")
+
+    def __len__(self) -> int:
+        return len(self._stories)
+
+    def story(self, sid: int) -> dict:
+        return self._stories[sid]
+
+    def assign_tokens(self, tokens: frozenset) -> int:
+        """Story ID for a title's tokens: the best match above the threshold, else a new story.
+
+        Ties go to the older story; titles without tokens always open a new one.
+        """
+        sig = minhash(tokens) if tokens else None
+        best_sid, best_sim = None, 0.0
+        if sig is not None:
+            for sid in sorted(self._lsh.candidates(sig)):
+                sim = jaccard(tokens, self._tokens[sid])
+                if sim > best_sim:
+                    best_sid, best_sim = sid, sim
+        if best_sim >= self.threshold:
+            self._tokens[best_sid] = self._tokens[best_sid] | tokens
+            self._sigs[best_sid] = merge_signatures(self._sigs[best_sid], sig)
+            self._lsh.add(best_sid, self._sigs[best_sid])
+            return best_sid
+
+        sid = self._next_id
+        self._next_id += 1
+        now = self._now()
+        self._stories[sid] = {"sources": [], "first_seen": now, "last_seen": now, "articles": {}}
+        self._tokens[sid] = tokens
+        self._sigs[sid] = sig
+        if sig is not None:
+            self._lsh.add(sid, sig)
+        return sid
+
+    def assign(self, article: dict) -> int:
+        """Story ID of an article; articles seen in earlier runs are not re-clustered."""
+        key = article_key(article)
+        sid = self._articles.get(key)
+        if sid is None:
+            sid = self.assign_tokens(title_tokens(article.get("title", "")))
+            self._articles[key] = sid
+        story = self._stories[sid]
+        now = self._now()
+        story["articles"].setdefault(key, now)
+        story["last_seen"] = now
+        source = article.get("source", "unknown")
+        if source not in story["sources"]:
+            story["sources"].append(source)
+        return sid
+
+    def already_sent(self, sent_index, since: str, until: str) -> set:
+        """IDs of stories sent on a day in [since, until) (YYYY-MM-DD) without articles first seen after the send."""
+        stale = set()
+        for sid, story in self._stories.items():
+            sent_at = sent_index.last_sent(story["articles"], since, until)
+            if not sent_at:
+                continue
+            newest = max(_parse_time(t, self.tz) for t in story["articles"].values())
+            if newest <= _parse_time(sent_at, self.tz):
+                stale.add(sid)
+        return stale
+
+    def save(self, retention_days: int = STORY_RETENTION_DAYS):
+        """Write the index, dropping stories not seen within the retention window."""
+        if not self.persist:
+            return
+        since = datetime.now(self.tz) - timedelta(days=retention_days)
+        stories = {}
+        for sid, story in self._stories.items():
+            if _parse_time(story["last_seen"], self.tz) < since:
+                continue
+            stories[str(sid)] = {
+                **story,
+                "tokens": sorted(self._tokens[sid]),
+                "sig": list(self._sigs[sid] or ()),
+            }
+        data = {"next_id": self._next_id, "stories": stories}
+        save_json(self.path, data, "story index")
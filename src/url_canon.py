@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Canonical URLs and the hashed index used by every URL dedup step.
+
+The same story often arrives under several URLs: tracking parameters
+(utm_*, ?ref=rss, WeChat's chksm/scene), mobile subdomains, http vs
+https, a trailing slash, or wrapped in a redirector.  ``canonical_url``
+maps those to one form and ``DedupIndex`` remembers a short hash of it,
+so fetch_raw_news (via the article store), fetch_rss, the focused split
+call and the post-AI pass all agree on what counts as a duplicate.
+"""
+
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that never change the page.  Generic names such as
+# "source", "from" or "share" are left alone: some sites select content by them.
+TRACKING_PARAMS = {
+    "ref", "ref_src", "ref_url", "referrer", "via",
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "spm", "share_source", "share_from", "cmpid", "ncid", "sr_share", "guccounter",
+}
+TRACKING_PREFIXES = ("utm_", "mtm_", "pk_", "hmsr", "at_")
+
+# WeChat article links (mp.weixin.qq.com, incl. those from WeWe RSS / wechat2rss):
+# only these parameters identify the article
+WECHAT_HOST = "mp.weixin.qq.com"
+WECHAT_PARAMS = {"__biz", "mid", "idx", "sn"}
+
+# Host prefixes for mobile / www variants of the same site
+HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+
+# Redirectors that carry the target URL in a query parameter, by host -> the
+# path they redirect on ("" = any).  google.com only on /url: /search?q=<url>
+# is a search, not a link to <url>.  Path-only shorteners (t.cn, bit.ly) are
+# left alone: the target isn't in the URL.
+REDIRECTOR_HOSTS = {
+    "feedproxy.google.com": "", "feeds.feedburner.com": "", "google.com": "/url",
+    "link.zhihu.com": "", "l.facebook.com": "", "out.reddit.com": "", "news.google.com": "",
+}
+REDIRECT_PARAMS = ("url", "u", "q", "target", "to", "redirect", "link")
+
+
+def _unwrap(parts) -> str:
+    """Target URL of a known redirector, or "" if this isn't one."""
+    host = parts.netloc.lower()
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    path = REDIRECTOR_HOSTS.get(host)
+    if path is None or (path and parts.path != path):
+        return ""
+    params = dict(parse_qsl(parts.query))
+    for name in REDIRECT_PARAMS:
+        target = params.get(name, "")
+        if target.startswith(("http://", "https://")):
+            return target
+    return ""
+
+
+def canonical_url(url: str) -> str:
+    """Normalized form of a URL for duplicate detection (not for display)."""
+    url = (url or "").strip()
+    for _ in range(3):  # nested redirectors
+        parts = urlsplit(url)
+        if not parts.netloc:
+            return url
+        target = _unwrap(parts)
+        if not target:
+            break
+        url = target
+
+    host = parts.hostname or ""
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path.rstrip("/")
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+    if host == WECHAT_HOST:
+        # Short links (/s/<id>) identify the article on their own
+        query = [] if path.startswith("/s/") else [(k, v) for k, v in query if k in WECHAT_PARAMS]
+    # http and https serve the same article
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def url_key(url: str) -> str:
+    """Short stable hash of the canonical URL ("" for an empty URL)."""
+    canonical = canonical_url(url)
+    if not canonical:
+        return ""
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class DedupIndex:
+    """Set of canonical URL hashes.  Empty URLs are never duplicates."""
+
+    def __init__(self, urls=()):
+        self._keys = set()
+        for url in urls:
+            self.add(url)
+
+    def __contains__(self, url: str) -> bool:
+        key = url_key(url)
+        return bool(key) and key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, url: str) -> bool:
+        """Record a URL; returns False if it was already seen."""
+        key = url_key(url)
+        if not key:
+            return True
+        if key in self._keys:
+            return False
+        self._keys.add(key)
+        return True